@@ -1,7 +1,9 @@
 from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
+from pydantic import BaseModel, Field
 from agents.agents import AgentBuilder
 
 system_prompt = """
@@ -22,12 +24,48 @@ class ExplainingAgent(AgentBuilder):
         super().__init__(model)
 
     def build(self, **kwargs) -> CompiledStateGraph:
-        # Create the agent
-        memory = MemorySaver()
+        # Create the agent, checkpointing is opt-in since these are one-shot calls
+        checkpointer = kwargs.get("checkpointer")
         tools = []
         return create_react_agent(
             self.model, 
             tools, 
-            checkpointer=memory, 
+            checkpointer=checkpointer, 
             prompt=system_prompt
         )
+
+
+batch_system_prompt = """
+    You are an agent responsible of explaining investments to someone who's not familiar with investments
+    You are given a list of investment ideas, and for EACH one you will explain what does the investment mean in a short sentence/paragraph.
+
+    This needs to be for someone who is not in the investment world.
+
+    With the investments, you'll also receive something that the user likes (like a sport, or anything).
+    When explaning, use an analogy with this preference of the user, so it's simpler for the user to know what each investment type represents
+
+    Return one explanation per investment, using the investment name EXACTLY as given.
+"""
+
+class InvestmentExplanation(BaseModel):
+    name: str = Field(description='The name of the investment, exactly as given')
+    explanation: str = Field(description='The explanation of the investment')
+
+class BatchExplanationResponse(BaseModel):
+    explanations: list[InvestmentExplanation] = Field(description='One explanation per investment')
+
+class BatchExplainingAgent(AgentBuilder):
+    """Explains all of a plan's investments in a single structured-output call"""
+
+    def __init__(self, model) -> None:
+        super().__init__(model)
+
+    def build(self, **kwargs) -> Runnable:
+        # A plain prompt + structured output chain: there are no tools, so the
+        # ReAct loop would only add turns
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", batch_system_prompt),
+            ("human", "{input}"),
+        ])
+        # include_raw keeps the message, and so its token usage, next to the parsed response
+        return prompt | self.model.with_structured_output(BatchExplanationResponse, include_raw=True)
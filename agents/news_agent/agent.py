@@ -1,28 +1,27 @@
 # Import relevant functionality
-from langchain.chat_models import init_chat_model
-from langchain_tavily import TavilySearch
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph.state import CompiledStateGraph
-from langgraph.prebuilt import create_react_agent
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 
 from agents.agents import AgentBuilder
 
 # Default system prompt for the news agent
-system_prompt = """You are a news agent. 
+system_prompt = """You are a news agent.
 Your goal is to get the most relevant financial news that would relate to the potential investments our user could make.
-Only restrict to news for investing in Argentina.
+Only restrict to news for investing in {country}.
 
-Only return the title of the news, and the source for it"""
+You are given the results of a news search. Only return the title of the news, and the source for it"""
 
 class NewsAgentBuilder(AgentBuilder):
+    """Condenses prefetched search results into a country's news digest"""
 
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, model) -> None:
+        super().__init__(model)
 
-    def build(self, **kwargs) -> CompiledStateGraph:
-        # Create the agent
-        memory = MemorySaver()
-        model = init_chat_model("gpt-5-mini", model_provider="openai")        
-        search = TavilySearch(max_results=10)
-        tools = [search]
-        return create_react_agent(model, tools, checkpointer=memory, prompt=system_prompt)
\ No newline at end of file
+    def build(self, **kwargs) -> Runnable:
+        # The search runs ahead of time (see news.NewsDigestService), so this
+        # is a single call instead of a ReAct loop deciding when to search
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", "{results}"),
+        ])
+        return prompt | self.model
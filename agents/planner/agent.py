@@ -1,10 +1,12 @@
 # Import relevant functionality
-from langchain.chat_models import init_chat_model
-from langchain_tavily import TavilySearch
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph.state import CompiledStateGraph
-from langgraph.prebuilt import create_react_agent
-from pydantic import BaseModel, Field
+import json
+import re
+from typing import Any, Optional, Tuple
+
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field, ValidationError
 
 from agents.agents import AgentBuilder
 
@@ -32,6 +34,8 @@ The meaning of the fields are:
 - Reason: The reason to invest in this asset
 - Risk: A val between 1 and 10 to identify the risk
 - Ease of use: How easy is it for the user to invest in the asset  Value between 1 and 10  This in important, since we'll be advicing the user to start by investing a little bit of its money on the one with the lowest value
+
+You may also get recent financial news for the user's country. Use it as context for your choices, but never as the only reason for an investment.
 """
 
 class InvestmentAmount(BaseModel):
@@ -41,24 +45,100 @@ class InvestmentAmount(BaseModel):
     reason: str = Field(description='The reason to include this investment')
     explanation: str | None = Field(default=None)
     risk: int = Field(description='A val between 1 and 10 describing the risk')
-    ease_of_use: int = Field('A val between 1 and 10 that describes the ease of use')
+    ease_of_use: int = Field(description='A val between 1 and 10 that describes the ease of use')
 
 class AgentResponse(BaseModel):
     investments: list[InvestmentAmount] = Field(description='List of the investments')
 
 class InvestmentPlannerAgent(AgentBuilder):
+    """Plans investments in a single structured-output call.
+
+    The chain returns {"raw", "parsed", "parsing_error"} so a response that
+    doesn't parse can still be repaired with parse_planner_output.
+    """
 
     def __init__(self, model) -> None:
         super().__init__(model)
 
-    def build(self, **kwargs) -> CompiledStateGraph:
-        # Create the agent
-        memory = MemorySaver()
-        tools = []
-        return create_react_agent(
-            self.model, 
-            tools, 
-            checkpointer=memory, 
-            prompt=system_prompt,
-            response_format=('Respond in this format', AgentResponse)
-        )
\ No newline at end of file
+    def build(self, **kwargs) -> Runnable:
+        # There are no tools, so the ReAct loop would only add a second turn
+        # to produce the structured response
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=system_prompt),
+            ("human", "{input}"),
+        ])
+        return prompt | self.model.with_structured_output(AgentResponse, include_raw=True)
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def _raw_text(raw: Any) -> str:
+    """The JSON the model produced, from a tool call or the message content."""
+    tool_calls = getattr(raw, "tool_calls", None) or []
+    if tool_calls:
+        return json.dumps(tool_calls[0].get("args", {}))
+    invalid_tool_calls = getattr(raw, "invalid_tool_calls", None) or []
+    if invalid_tool_calls:
+        return invalid_tool_calls[0].get("args") or ""
+    content = getattr(raw, "content", raw)
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+def _repair_json(text: str) -> Optional[Any]:
+    """Parse JSON wrapped in code fences or prose, or with trailing commas."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```[a-zA-Z]*\s*|\s*```$", "", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text[start:end + 1]))
+    except ValueError:
+        return None
+
+def _partial_investments(text: str) -> list:
+    """Salvage the complete, valid investments from truncated or broken output."""
+    start = text.find("[", max(text.find('"investments"'), 0))
+    if start == -1:
+        return []
+    decoder = json.JSONDecoder()
+    investments = []
+    position = start + 1
+    while True:
+        position = text.find("{", position)
+        if position == -1:
+            break
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except ValueError:
+            break
+        try:
+            investments.append(InvestmentAmount(**item))
+        except (TypeError, ValidationError):
+            continue
+    return investments
+
+def parse_planner_output(output: dict) -> Tuple[AgentResponse, str]:
+    """Get the plan out of the planner chain output.
+
+    Returns the plan and how it was obtained: "structured" when the model
+    output parsed, "repaired" when it parsed after cleaning up the JSON, or
+    "partial" when only some investments could be salvaged. Raises
+    ValueError when nothing usable came back.
+    """
+    if output.get("parsed") is not None:
+        return output["parsed"], "structured"
+
+    text = _raw_text(output.get("raw"))
+    data = _repair_json(text)
+    if data is not None:
+        try:
+            return AgentResponse(**data), "repaired"
+        except (TypeError, ValidationError):
+            pass
+
+    investments = _partial_investments(text)
+    if investments:
+        return AgentResponse(investments=investments), "partial"
+    raise ValueError(f"Planner returned no usable investments: {output.get('parsing_error')}")
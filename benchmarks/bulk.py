@@ -0,0 +1,105 @@
+"""Benchmark of bulk plan ingestion (see database.create_investment_plans_bulk).
+
+Writes generated plans one create_investment_plan call at a time, then
+through create_investment_plans_bulk at several chunk sizes, and reports
+plans/s for each. A second run streams a large generated input through the
+bulk path under tracemalloc and reports the peak, which should depend on
+the chunk size and not on the input size. MongoDB is the in-memory stand-in
+from benchmarks.workflow unless a URI is given.
+"""
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+USER_ID = "bench-bulk-user"
+
+def generate_plans(count: int, investments: int = 5) -> Iterator[Any]:
+    """`count` plans, built lazily so the input is never held in memory."""
+    from models import InvestmentPlanCreate
+
+    for index in range(count):
+        yield InvestmentPlanCreate(
+            user_id=USER_ID,
+            user_context={"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+            message=f"Tengo {1000 + index} dolares para invertir a largo plazo",
+            likes=["futbol"],
+            investments=[
+                {"name": f"Investment {i}", "amount": 100.0, "percentage": 100 / investments,
+                 "reason": "Diversification", "risk": 1 + i % 10, "ease_of_use": 1 + i % 10,
+                 "explanation": "Explanation sentence. " * 10}
+                for i in range(investments)
+            ],
+        )
+
+async def _clear() -> None:
+    from database import Database
+
+    collection = await Database.get_collection("investment_plans")
+    await collection.delete_many({"user_id": USER_ID})
+
+async def measure_single(plans: int) -> Dict[str, Any]:
+    from database import create_investment_plan
+
+    started = time.perf_counter()
+    for plan in generate_plans(plans):
+        await create_investment_plan(plan)
+    wall = time.perf_counter() - started
+    await _clear()
+    return {"path": "insert_one", "chunk_size": 1, "plans": plans, "plans_per_second": round(plans / wall, 1)}
+
+async def measure_bulk(plans: int, chunk_size: int) -> Dict[str, Any]:
+    from database import create_investment_plans_bulk
+
+    failed = 0
+    started = time.perf_counter()
+    async for result in create_investment_plans_bulk(generate_plans(plans), chunk_size):
+        failed += not result["success"]
+    wall = time.perf_counter() - started
+    await _clear()
+    return {"path": "bulk", "chunk_size": chunk_size, "plans": plans, "failed": failed, "plans_per_second": round(plans / wall, 1)}
+
+async def measure_peak_memory(plans: int, chunk_size: int) -> Dict[str, Any]:
+    """Peak traced memory while streaming `plans` plans through the bulk path.
+
+    Each chunk is deleted once its results come back, so documents kept by
+    the in-memory stand-in don't count towards the peak.
+    """
+    from database import create_investment_plans_bulk
+
+    tracemalloc.start()
+    try:
+        seen = 0
+        async for _ in create_investment_plans_bulk(generate_plans(plans), chunk_size):
+            seen += 1
+            if seen % chunk_size == 0:
+                await _clear()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    await _clear()
+    return {"plans": plans, "chunk_size": chunk_size, "peak_bytes": peak}
+
+async def run_benchmark(
+    plans: int,
+    chunk_sizes: List[int],
+    memory_plans: int,
+    memory_chunk_size: int,
+    mongodb_uri: Optional[str] = None,
+) -> Dict[str, Any]:
+    from benchmarks.workflow import connect_database
+    from database import Database
+
+    await connect_database(mongodb_uri)
+    try:
+        # Warm up the connection and the rollup collections outside the measurements
+        await measure_bulk(min(plans, 100), 100)
+        throughput = [await measure_single(plans)]
+        for chunk_size in chunk_sizes:
+            throughput.append(await measure_bulk(plans, chunk_size))
+        memory = [
+            await measure_peak_memory(count, memory_chunk_size)
+            for count in (memory_plans // 10, memory_plans)
+        ]
+    finally:
+        await Database.close_db()
+    return {"throughput": throughput, "memory": memory}
@@ -0,0 +1,71 @@
+"""Memory soak test of the `memory` checkpointer policy.
+
+Runs thousands of plans through the workflow with the fake provider and
+AGENT_CHECKPOINTER=memory, so every explainer call checkpoints into one
+BoundedMemorySaver. Samples the process RSS and the saver's stats as it
+goes: with eviction working both stay flat once the saver is full.
+"""
+import asyncio
+import gc
+import os
+import resource
+import uuid
+from typing import Any, Dict, List
+
+def configure_environment(max_threads: int, max_bytes: int) -> None:
+    """Use the stub model and a small memory checkpointer; must run before `graph` is imported."""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = "0"
+    os.environ["AGENT_CHECKPOINTER"] = "memory"
+    os.environ["AGENT_CHECKPOINT_MAX_THREADS"] = str(max_threads)
+    os.environ["AGENT_CHECKPOINT_MAX_BYTES"] = str(max_bytes)
+    os.environ.setdefault("EXPLANATION_CACHE_ENABLED", "false")
+    os.environ.setdefault("PLAN_CACHE_ENABLED", "false")
+    os.environ.setdefault("NEWS_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+async def run_soak(plans: int, concurrency: int, samples: int = 10) -> List[Dict[str, Any]]:
+    """Run `plans` workflows, `concurrency` at a time, sampling RSS and saver stats.
+
+    The first sample is taken after a warm-up of one round, so imports,
+    graph compilation and filling the saver aren't counted as growth.
+    """
+    from graph import get_checkpointer, get_graph
+
+    graph = get_graph()
+
+    async def run_plan(index: int) -> None:
+        await graph.ainvoke({
+            "user_context": {"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+            "user_message": f"Tengo {1000 + index} dolares para invertir a largo plazo",
+            "likes": ["futbol"],
+            "investments": [],
+            "explained_investments": [],
+            "run_id": uuid.uuid4().hex,
+            "bypass_plan_cache": True,
+        })
+
+    async def run_round(start: int, count: int) -> None:
+        for offset in range(0, count, concurrency):
+            await asyncio.gather(*[run_plan(start + offset + i) for i in range(min(concurrency, count - offset))])
+
+    warmup = max(get_checkpointer().max_threads, concurrency)
+    await run_round(0, warmup)
+    results = []
+    per_sample = max(plans // samples, 1)
+    for sample in range(samples + 1):
+        if sample:
+            await run_round(warmup + (sample - 1) * per_sample, per_sample)
+        gc.collect()
+        results.append({"plans": sample * per_sample, "rss_bytes": rss_bytes(), **get_checkpointer().stats()})
+    return results
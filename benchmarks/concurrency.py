@@ -0,0 +1,54 @@
+"""Load test of the plan workflow with a stub chat model.
+
+Runs the LangGraph workflow (planner plus explainers) with the `fake`
+provider sleeping a fixed time per call, first one plan at a time and then
+with many plans in flight, and compares the throughput. With async nodes
+the sleeps overlap on one event loop, so throughput should grow with the
+concurrency; a blocking call anywhere in the workflow serializes the plans
+and shows up as no speedup.
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict
+
+def configure_environment(latency_seconds: float) -> None:
+    """Use the stub model with no caches; must run before `graph` is imported."""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = str(latency_seconds)
+    os.environ.setdefault("EXPLANATION_CACHE_ENABLED", "false")
+    os.environ.setdefault("PLAN_CACHE_ENABLED", "false")
+    os.environ.setdefault("NEWS_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+async def measure_throughput(plans: int, concurrency: int) -> Dict[str, Any]:
+    """Run `plans` workflows with at most `concurrency` in flight."""
+    from graph import get_graph
+
+    graph = get_graph()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_plan(index: int) -> None:
+        async with slots:
+            await graph.ainvoke({
+                "user_context": {"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+                "user_message": f"Tengo {1000 + index} dolares para invertir a largo plazo",
+                "likes": ["futbol"],
+                "investments": [],
+                "explained_investments": [],
+                "run_id": uuid.uuid4().hex,
+                "bypass_plan_cache": True,
+            })
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_plan(index) for index in range(plans)])
+    wall = time.perf_counter() - started
+    return {"plans": plans, "concurrency": concurrency, "seconds": round(wall, 3), "throughput_pps": round(plans / wall, 2)}
+
+async def run_benchmark(plans: int, concurrency: int) -> Dict[str, Dict[str, Any]]:
+    """Throughput one plan at a time and at `concurrency`, after a warm-up run."""
+    await measure_throughput(1, 1)
+    sequential = await measure_throughput(max(plans // concurrency, 2), 1)
+    concurrent = await measure_throughput(plans, concurrency)
+    return {"sequential": sequential, "concurrent": concurrent}
@@ -0,0 +1,127 @@
+"""Benchmark of the explainer modes: fanout (one call per investment) against batch.
+
+Runs plans through the workflow with a stub chat model that answers like
+the fake provider but counts tokens (about 4 characters each, tool schemas
+included) and sleeps a fixed time plus a time per output token, so a long
+batch answer costs more than a short one as it would on a real provider.
+The stub answers the batch call with an explanation for every investment
+named in the prompt. Reports LLM calls, prompt and completion tokens per
+plan, and plan latency for each mode.
+"""
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm import FAKE_TEXT, FakeChatModel
+
+MODES = ("fanout", "batch")
+_INVESTMENT_NAME = re.compile(r"name=(['\"])(.*?)\1")
+
+def estimate_tokens(text: str) -> int:
+    return max(len(text) // 4, 1)
+
+class TokenCountingChatModel(FakeChatModel):
+    """FakeChatModel with estimated token usage and output dependent latency."""
+
+    investments: int = 3
+    base_latency_seconds: float = 0.3
+    seconds_per_output_token: float = 0.004
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._respond(kwargs)
+        message = result.generations[0].message
+        if message.tool_calls and message.tool_calls[0]["name"] == "AgentResponse":
+            message = self._plan_message(message)
+        elif message.tool_calls and message.tool_calls[0]["name"] == "BatchExplanationResponse":
+            message = self._batch_message(message, messages)
+        prompt = "".join(str(item.content) for item in messages) + json.dumps(kwargs.get("tools") or [])
+        completion = message.content or json.dumps([call["args"] for call in message.tool_calls])
+        usage = {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(completion)}
+        message.usage_metadata = {**usage, "total_tokens": sum(usage.values())}
+        self.input_tokens += usage["input_tokens"]
+        self.output_tokens += usage["output_tokens"]
+        await asyncio.sleep(self.base_latency_seconds + usage["output_tokens"] * self.seconds_per_output_token)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _plan_message(self, message: AIMessage) -> AIMessage:
+        investments = [
+            {"name": f"Investment {i + 1}", "amount": 1000, "percentage": 100 / self.investments,
+             "reason": "Diversification across assets", "risk": 1 + i % 10, "ease_of_use": 1 + (i * 3) % 10}
+            for i in range(self.investments)
+        ]
+        return AIMessage(content="", tool_calls=[{**message.tool_calls[0], "args": {"investments": investments}}])
+
+    def _batch_message(self, message: AIMessage, messages: List[Any]) -> AIMessage:
+        names = [match[1] for match in _INVESTMENT_NAME.findall(str(messages[-1].content))]
+        explanations = [{"name": name, "explanation": FAKE_TEXT["explainer"]} for name in names]
+        return AIMessage(content="", tool_calls=[{**message.tool_calls[0], "args": {"explanations": explanations}}])
+
+def configure_environment() -> None:
+    """No caches or news, so every plan pays for its calls; must run before `graph` is imported."""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ.setdefault("EXPLANATION_CACHE_ENABLED", "false")
+    os.environ.setdefault("PLAN_CACHE_ENABLED", "false")
+    os.environ.setdefault("NEWS_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+async def run_mode(mode: str, plans: int, investments: int, base_latency: float, per_token_latency: float) -> Dict[str, Any]:
+    """Run `plans` concurrent plans of `investments` investments with EXPLAINER_MODE=`mode`."""
+    import graph
+    from llm import model_registry
+
+    models = {
+        role: TokenCountingChatModel(
+            role=role, investments=investments, base_latency_seconds=base_latency, seconds_per_output_token=per_token_latency,
+        )
+        for role in ("planner", "explainer")
+    }
+    for role, model in models.items():
+        model_registry.override(role, model)
+    # The agents are cached with the model they were built on
+    graph.get_planning_agent.cache_clear()
+    graph.get_explanation_agent.cache_clear()
+    graph.get_batch_explanation_agent.cache_clear()
+    os.environ["EXPLAINER_MODE"] = mode
+
+    latencies: List[float] = []
+
+    async def run_plan(index: int) -> None:
+        started = time.perf_counter()
+        await graph.get_graph().ainvoke({
+            "user_context": {"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+            "user_message": f"Tengo {1000 + index} dolares para invertir a largo plazo",
+            "likes": ["futbol"],
+            "investments": [],
+            "explained_investments": [],
+            "run_id": uuid.uuid4().hex,
+            "bypass_plan_cache": True,
+        })
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[run_plan(index) for index in range(plans)])
+    return {
+        "mode": mode,
+        "investments": investments,
+        "calls_per_plan": round(sum(model.calls for model in models.values()) / plans, 2),
+        "input_tokens_per_plan": round(sum(model.input_tokens for model in models.values()) / plans),
+        "output_tokens_per_plan": round(sum(model.output_tokens for model in models.values()) / plans),
+        "p50_seconds": round(statistics.median(latencies), 3),
+        "max_seconds": round(max(latencies), 3),
+    }
+
+async def run_benchmark(plans: int, sizes: List[int], base_latency: float, per_token_latency: float) -> List[Dict[str, Any]]:
+    return [
+        await run_mode(mode, plans, investments, base_latency, per_token_latency)
+        for investments in sizes
+        for mode in MODES
+    ]
@@ -0,0 +1,58 @@
+"""Benchmark of the portfolio normalization stage (see portfolio.py).
+
+Builds batches of plans with the kinds of mistakes planner output has
+(percentages that don't add up to 100, missing or string amounts, scores
+out of range, unnamed rows) from a seeded RNG, and times repairing them
+with one normalize_portfolios call against one normalize_portfolio call
+per plan.
+"""
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+def make_plans(count: int, investments: int, seed: int = 0) -> Tuple[List[List[Dict[str, Any]]], List[Optional[float]]]:
+    """`count` messy plans of `investments` rows each, and their requested totals."""
+    rng = random.Random(seed)
+    plans = []
+    totals: List[Optional[float]] = []
+    for plan_number in range(count):
+        total = rng.choice([None, float(rng.randint(500, 50000))])
+        plan = []
+        for i in range(investments):
+            percentage = rng.uniform(5, 40)
+            plan.append({
+                "name": "" if rng.random() < 0.02 else f"Investment {plan_number}-{i}",
+                "amount": rng.choice([None, "n/a", round((total or 1000) * percentage / 100, 2), rng.uniform(10, 5000)]),
+                "percentage": percentage if rng.random() < 0.9 else None,
+                "risk": rng.choice([rng.randint(1, 10), rng.randint(-3, 15), None, "7"]),
+                "ease_of_use": rng.choice([rng.randint(1, 10), rng.randint(0, 12)]),
+                "reason": "Diversification",
+            })
+        plans.append(plan)
+        totals.append(total)
+    return plans, totals
+
+def run_benchmark(plans: int, investments: int, repeats: int = 3, seed: int = 0) -> Dict[str, float]:
+    """Best of `repeats` wall times of the batched and the per-plan normalization, in ms."""
+    from portfolio import normalize_portfolio, normalize_portfolios
+
+    batch, totals = make_plans(plans, investments, seed)
+
+    def best(run) -> float:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    batched = best(lambda: normalize_portfolios(batch, totals))
+    per_plan = best(lambda: [normalize_portfolio(plan, total) for plan, total in zip(batch, totals)])
+    return {
+        "plans": plans,
+        "investments": investments,
+        "batched_ms": round(batched, 2),
+        "per_plan_ms": round(per_plan, 2),
+        "batched_us_per_plan": round(batched / plans * 1000, 2),
+        "per_plan_us_per_plan": round(per_plan / plans * 1000, 2),
+    }
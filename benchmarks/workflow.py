@@ -0,0 +1,207 @@
+"""Offline benchmark of the plan endpoints.
+
+Drives POST /plan, GET /plans/{user_id}, GET /plan/{plan_id} and
+PATCH /plan/{plan_id} in process
+(through httpx's ASGI transport) at a fixed concurrency, with LLM responses
+replayed from fixtures (see llm.ReplayChatModel) and MongoDB replaced by an
+in-memory stand-in (mongomock-motor) unless a MongoDB URI is given. Reports
+p50/p95/p99 latency and throughput per scenario, and can compare a run with
+a saved baseline to catch regressions. The PATCH scenario changes the total
+and the user context at once, so every revision re-plans, and it stops the
+run if a revision doesn't come back with the requested total.
+"""
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+SCENARIOS = ("plan", "user_plans", "plan_by_id", "revise_plan")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def configure_environment(fixtures_dir: str, latency: str, latency_scale: float) -> None:
+    """Point the app at the replayed models; must run before `main` is imported.
+
+    Explicitly set variables win, so e.g. EXPLANATION_CACHE_ENABLED=true
+    benchmarks warm explanation caches. By default every plan pays for its
+    explainer calls.
+    """
+    os.environ.setdefault("LLM_PROVIDER", "replay")
+    os.environ.setdefault("LLM_REPLAY_DIR", fixtures_dir)
+    os.environ.setdefault("LLM_REPLAY_LATENCY", latency)
+    os.environ.setdefault("LLM_REPLAY_LATENCY_SCALE", str(latency_scale))
+    os.environ.setdefault("EXPLANATION_CACHE_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+async def connect_database(mongodb_uri: Optional[str]) -> None:
+    from database import Database
+
+    if mongodb_uri:
+        os.environ["MONGODB_URI"] = mongodb_uri
+        await Database.connect_db()
+        return
+    try:
+        import mongomock.collection
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        raise ImportError("Benchmarking without --mongodb-uri needs the mongomock-motor package") from e
+
+    # pymongo 4.14 passes `sort` to bulk updates and replaces, which mongomock doesn't accept yet
+    builder = mongomock.collection.BulkOperationBuilder
+    for method in ("add_update", "add_replace"):
+        original = getattr(builder, method)
+        setattr(builder, method, lambda self, *args, sort=None, _original=original, **kwargs: _original(self, *args, **kwargs))
+    Database.client = AsyncMongoMockClient()
+    Database.db = Database.client.investing_agent
+
+def percentile(latencies: List[float], q: int) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+
+async def run_scenario(request: Callable[[int], Awaitable[Any]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send `requests` requests from `concurrency` workers and summarize the latencies."""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while (index := next(counter)) < requests:
+            started = time.perf_counter()
+            response = await request(index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(requests / wall, 2),
+    }
+
+async def check_revision_amounts(client: Any, user_id: str) -> None:
+    """A message with a year in it revises the amount, not the year.
+
+    Seeds a plan of 1500 for "Tengo 1500 dolares para retirarme en 2045"
+    and changes only the amount in the message, which must rescale the plan
+    to 2000 without re-planning.
+    """
+    from database import create_investment_plan, delete_investment_plan
+    from models import InvestmentPlanCreate
+
+    plan = await create_investment_plan(InvestmentPlanCreate(
+        user_id=user_id,
+        user_context={"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+        message="Tengo 1500 dolares para retirarme en 2045",
+        likes=["futbol"],
+        investments=[
+            {"name": "Plazo fijo", "amount": 900.0, "percentage": 60.0, "reason": "Low risk", "risk": 2, "ease_of_use": 9},
+            {"name": "CEDEARs", "amount": 600.0, "percentage": 40.0, "reason": "Growth", "risk": 6, "ease_of_use": 6},
+        ],
+    ))
+    plan_id = plan.id
+    try:
+        response = await client.patch(f"/plan/{plan_id}", json={"message": "Tengo 2000 dolares para retirarme en 2045"})
+        response.raise_for_status()
+        revised = response.json()
+        total = sum(investment["amount"] for investment in revised["investments"])
+        if revised["recomputed"] != ["amounts"] or abs(total - 2000) > 0.01:
+            raise RuntimeError(f"Changing 1500 to 2000 next to a year recomputed {revised['recomputed']} totalling {total}, not the amounts totalling 2000")
+    finally:
+        await delete_investment_plan(plan_id)
+
+async def run_benchmark(scenarios: List[str], requests: int, concurrency: int, mongodb_uri: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    from database import Database
+    from main import MOCK_USER_ID, app
+
+    await connect_database(mongodb_uri)
+    results: Dict[str, Dict[str, Any]] = {}
+    plan_ids: List[str] = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            async def create_plan(index: int):
+                # Distinct amounts, so concurrent requests don't share one workflow run
+                response = await client.post("/plan", json={
+                    "user_context": {"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+                    "message": f"Tengo {1000 + index} dolares para invertir a largo plazo",
+                    "likes": ["futbol"],
+                })
+                if response.status_code == 200:
+                    plan_ids.append(response.json()["plan_id"])
+                return response
+
+            async def user_plans(index: int):
+                response = await client.get(f"/plans/{MOCK_USER_ID}", params={"limit": 10})
+                if response.status_code == 200:
+                    for item in response.json()["items"]:
+                        if "id" not in item or "_id" in item:
+                            raise RuntimeError(f"GET /plans returned an item with keys {sorted(item)}, not `id`")
+                return response
+
+            async def plan_by_id(index: int):
+                return await client.get(f"/plan/{plan_ids[index % len(plan_ids)]}")
+
+            async def revise_plan(index: int):
+                amount = 20000 + index
+                response = await client.patch(f"/plan/{plan_ids[index % len(plan_ids)]}", json={
+                    "amount": amount,
+                    "user_context": {"investmentProfile": f"profile-{index}"},
+                })
+                if response.status_code == 200:
+                    total = sum(investment["amount"] for investment in response.json()["investments"])
+                    if abs(total - amount) > 0.01:
+                        raise RuntimeError(f"PATCH /plan with amount {amount} returned a plan totalling {total}")
+                return response
+
+            requests_by_scenario = {"plan": create_plan, "user_plans": user_plans, "plan_by_id": plan_by_id, "revise_plan": revise_plan}
+            await check_revision_amounts(client, MOCK_USER_ID)
+            # Seed plans for the reads and warm up (graph compilation, first
+            # connections), all outside the measurements
+            await run_scenario(create_plan, concurrency, concurrency)
+            for scenario in scenarios:
+                results[scenario] = await run_scenario(requests_by_scenario[scenario], requests, concurrency)
+    finally:
+        await Database.close_db()
+    return results
+
+def find_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Scenarios whose p95 grew or throughput dropped by more than `tolerance`."""
+    regressions = []
+    for scenario, result in results.items():
+        before = baseline.get(scenario)
+        if not before:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {before['throughput_rps']}/s -> {result['throughput_rps']}/s")
+    return regressions
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'scenario':<11} {'requests':>8} {'conc':>5} {'errors':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'req/s':>8}"]
+    for scenario, result in results.items():
+        lines.append(
+            f"{scenario:<11} {result['requests']:>8} {result['concurrency']:>5} {result['errors']:>6} "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['throughput_rps']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, encoding="utf-8") as results_file:
+        return json.load(results_file)
+
+def save_results(path: str, results: Dict[str, Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2)
@@ -0,0 +1,324 @@
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import orjson
+
+from agents.explainer.agent import system_prompt as explainer_system_prompt
+from telemetry import record_cache_lookup
+
+logger = logging.getLogger("open_invest.cache")
+
+_MISSING = object()
+
+def normalize_text(value: str) -> str:
+    """Lowercase, strip accents and collapse whitespace so equivalent names share a key."""
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", value).strip().lower()
+
+class TTLCache:
+    """In-process cache with LRU eviction and a per-entry time to live."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class ExplanationCache:
+    """Content-addressed cache for explainer output.
+
+    Entries are keyed on the normalized investment name, the user likes and
+    the explainer prompt/model version, so changing the prompt or the model
+    naturally invalidates old explanations. The in-process tier is always on;
+    the MongoDB tier is shared between replicas and enabled with
+    EXPLANATION_CACHE_MONGO=true.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        enabled: bool = True,
+        max_entries: int = 10000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        use_mongo: bool = False,
+    ) -> None:
+        prompt_hash = hashlib.sha256(explainer_system_prompt.encode("utf-8")).hexdigest()[:12]
+        self.version = f"{model_name}:{prompt_hash}"
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.mongo_hits = 0
+        self.mongo_misses = 0
+        self.mongo_errors = 0
+
+    @classmethod
+    def from_env(cls, model_name: str) -> "ExplanationCache":
+        return cls(
+            model_name=model_name,
+            enabled=os.getenv("EXPLANATION_CACHE_ENABLED", "true").lower() == "true",
+            max_entries=int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            use_mongo=os.getenv("EXPLANATION_CACHE_MONGO", "false").lower() == "true",
+        )
+
+    def key(self, investment_name: str, likes: str) -> str:
+        """Build the cache key for an (investment, likes) pair."""
+        normalized_likes = ",".join(sorted(normalize_text(like) for like in likes.split(",") if like.strip()))
+        raw = "\x1f".join([self.version, normalize_text(investment_name), normalized_likes])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        explanation = self.memory.get(key)
+        if explanation is not None or not self.use_mongo:
+            record_cache_lookup("explanation", explanation is not None)
+            return explanation
+
+        # Imported here to keep the cache usable without a database
+        from database import get_cached_explanation
+        try:
+            explanation = await get_cached_explanation(key)
+        except Exception as e:
+            self.mongo_errors += 1
+            logger.warning("Explanation cache lookup failed: %s", e)
+            record_cache_lookup("explanation", False)
+            return None
+        record_cache_lookup("explanation", explanation is not None)
+        if explanation is None:
+            self.mongo_misses += 1
+            return None
+        self.mongo_hits += 1
+        self.memory.set(key, explanation)
+        return explanation
+
+    async def set(self, key: str, explanation: str) -> None:
+        if not self.enabled or not explanation:
+            return
+        self.memory.set(key, explanation)
+        if not self.use_mongo:
+            return
+
+        from database import save_cached_explanation
+        try:
+            await save_cached_explanation(key, explanation, self.ttl_seconds)
+        except Exception as e:
+            self.mongo_errors += 1
+            logger.warning("Explanation cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "version": self.version,
+            "memory": self.memory.stats(),
+            "mongo": {
+                "enabled": self.use_mongo,
+                "hits": self.mongo_hits,
+                "misses": self.mongo_misses,
+                "errors": self.mongo_errors,
+            },
+        }
+
+class CacheBackend(ABC):
+    """Storage behind a ReadThroughCache"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process backend. Values are kept as the objects themselves."""
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.entries = TTLCache(max_entries=max_entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self.entries.set(key, value, ttl_seconds)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.entries.stats()
+        return {"backend": "memory", "entries": stats["entries"], "max_entries": stats["max_entries"], "evictions": stats["evictions"]}
+
+class RedisCacheBackend(CacheBackend):
+    """Backend shared by every replica, stores values as JSON.
+
+    Needs the redis package. Size limits and eviction are left to the Redis
+    server's maxmemory policy.
+    """
+
+    def __init__(self, url: str, prefix: str = "open-invest:") -> None:
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise ImportError("READ_CACHE_BACKEND=redis needs the redis package") from e
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        value = value.model_dump_json(by_alias=True) if hasattr(value, "model_dump_json") else orjson.dumps(value)
+        await self.client.set(self.prefix + key, value, px=int(ttl_seconds * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+class ReadThroughCache:
+    """Async read-through cache for one kind of pydantic model or document.
+
+    `get(key, loader)` returns the cached value or awaits `loader()` and
+    caches what it returns (misses, i.e. None, aren't cached). Shared
+    backends hand back JSON, which is validated into `model` on the way out,
+    or decoded as is when `model` is None.
+    Invalidations that land while a load is in flight keep that load from
+    being cached, so a writer never races a stale read back into the cache.
+    """
+
+    def __init__(self, name: str, model: Optional[type], backend: Optional[CacheBackend], ttl_seconds: float = 60) -> None:
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        if self.backend is None:
+            return await loader()
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("%s cache lookup failed: %s", self.name, e)
+            cached = None
+        record_cache_lookup(self.name, cached is not None)
+        if cached is not None:
+            self.hits += 1
+            if isinstance(cached, (str, bytes)):
+                return self.model.model_validate_json(cached) if self.model else orjson.loads(cached)
+            return cached
+
+        self.misses += 1
+        invalidations = self.invalidations
+        value = await loader()
+        if value is not None and invalidations == self.invalidations:
+            try:
+                await self.backend.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("%s cache write failed: %s", self.name, e)
+        return value
+
+    async def invalidate(self, *keys: str) -> None:
+        self.invalidations += 1
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("%s cache invalidation failed: %s", self.name, e)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.backend is not None,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            **(self.backend.stats() if self.backend else {}),
+        }
+
+def create_cache_backend() -> Optional[CacheBackend]:
+    """Build the read cache backend configured by READ_CACHE_BACKEND (memory, redis or none)."""
+    backend = os.getenv("READ_CACHE_BACKEND", "memory").lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCacheBackend(max_entries=int(os.getenv("READ_CACHE_MAX_ENTRIES", "10000")))
+    if backend == "redis":
+        return RedisCacheBackend(os.getenv("READ_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown read cache backend: {backend}")
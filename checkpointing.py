@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+
+class BoundedMemorySaver(InMemorySaver):
+    """In-memory checkpointer that evicts whole threads.
+
+    Threads are evicted least recently used first once there are more than
+    `max_threads` of them or their serialized checkpoints and writes add up
+    to more than `max_bytes`, and any thread idle for longer than
+    `ttl_seconds` is dropped on the next write. The keys each thread wrote
+    are indexed, so an eviction only touches that thread's entries.
+    """
+
+    def __init__(self, max_threads: int = 1000, ttl_seconds: float = 600, max_bytes: int = 64 * 1024 * 1024) -> None:
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # thread_id -> [last access time, approximate bytes stored, writes keys, blobs keys]
+        self._threads: "OrderedDict[str, list]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.evicted_threads = 0
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            if thread_id in self._threads:
+                self._threads[thread_id][0] = time.monotonic()
+                self._threads.move_to_end(thread_id)
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            saved_checkpoint, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            added = len(saved_checkpoint[1]) + len(saved_metadata[1])
+            blob_keys = [(thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()]
+            for blob_key in blob_keys:
+                added += len(self.blobs[blob_key][1])
+            self._track(thread_id, added, blob_keys=blob_keys)
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            thread_id = config["configurable"]["thread_id"]
+            outer_key = (thread_id, config["configurable"]["checkpoint_ns"], config["configurable"]["checkpoint_id"])
+            added = sum(
+                len(write[2][1])
+                for inner_key, write in self.writes.get(outer_key, {}).items()
+                if inner_key[0] == task_id
+            )
+            self._track(thread_id, added, writes_key=outer_key)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            entry = self._threads.pop(thread_id, None)
+            if entry is None:
+                # Not written through this saver, fall back to scanning every key
+                super().delete_thread(thread_id)
+                return
+            self.storage.pop(thread_id, None)
+            for writes_key in entry[2]:
+                self.writes.pop(writes_key, None)
+            for blob_key in entry[3]:
+                self.blobs.pop(blob_key, None)
+            self._total_bytes -= entry[1]
+
+    def _track(self, thread_id: str, added_bytes: int, writes_key: Optional[tuple] = None, blob_keys: Sequence[tuple] = ()) -> None:
+        entry = self._threads.setdefault(thread_id, [0.0, 0, set(), set()])
+        entry[0] = time.monotonic()
+        entry[1] += added_bytes
+        if writes_key is not None:
+            entry[2].add(writes_key)
+        entry[3].update(blob_keys)
+        self._total_bytes += added_bytes
+        self._threads.move_to_end(thread_id)
+        self._evict(current=thread_id)
+
+    def _evict(self, current: str) -> None:
+        expired_before = time.monotonic() - self.ttl_seconds
+        while len(self._threads) > 1:
+            oldest, (last_access, *_) = next(iter(self._threads.items()))
+            over_budget = len(self._threads) > self.max_threads or self._total_bytes > self.max_bytes
+            if oldest == current or not (over_budget or last_access < expired_before):
+                break
+            self.delete_thread(oldest)
+            self.evicted_threads += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": "memory",
+            "threads": len(self._threads),
+            "bytes": self._total_bytes,
+            "max_threads": self.max_threads,
+            "max_bytes": self.max_bytes,
+            "evicted_threads": self.evicted_threads,
+        }
+
+def create_checkpointer(policy: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """Build the agent checkpointer for the AGENT_CHECKPOINTER policy.
+
+    - none: no checkpointer, for stateless one-shot agent calls (default)
+    - memory: BoundedMemorySaver sized by AGENT_CHECKPOINT_MAX_THREADS,
+      AGENT_CHECKPOINT_TTL_SECONDS and AGENT_CHECKPOINT_MAX_BYTES
+    - mongo: MongoDBSaver on the existing Database client (needs the
+      langgraph-checkpoint-mongodb package and a connected Database)
+    """
+    policy = (policy or os.getenv("AGENT_CHECKPOINTER", "none")).lower()
+    if policy == "none":
+        return None
+    if policy == "memory":
+        return BoundedMemorySaver(
+            max_threads=int(os.getenv("AGENT_CHECKPOINT_MAX_THREADS", "1000")),
+            ttl_seconds=float(os.getenv("AGENT_CHECKPOINT_TTL_SECONDS", "600")),
+            max_bytes=int(os.getenv("AGENT_CHECKPOINT_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+    if policy == "mongo":
+        try:
+            from langgraph.checkpoint.mongodb import MongoDBSaver
+        except ImportError as e:
+            raise ImportError("AGENT_CHECKPOINTER=mongo needs the langgraph-checkpoint-mongodb package") from e
+        from database import Database
+
+        if Database.client is None:
+            raise RuntimeError("AGENT_CHECKPOINTER=mongo needs a connected Database")
+        # Motor wraps a regular pymongo client, which is what the saver expects
+        return MongoDBSaver(Database.client.delegate, db_name=Database.db.name)
+    raise ValueError(f"Unknown checkpointer policy: {policy}")
+
+def agent_config(run_id: str, role: str, key: str = "") -> RunnableConfig:
+    """Config for a one-shot agent call, with its own checkpointer thread."""
+    thread_id = ":".join(part for part in (run_id, role, key) if part)
+    return {"configurable": {"thread_id": thread_id}}
@@ -0,0 +1,357 @@
+"""Maintenance commands for Open-Invest.
+
+Usage:
+    python cli.py render-graph [--output investment_workflow.png]
+    python cli.py bench-startup [--runs 5] [--budget 3.0]
+    python cli.py bench-serialization [--sizes 5,20,100] [--iterations 1000]
+    python cli.py bench-concurrency [--plans 40] [--concurrency 10] [--min-speedup 4]
+    python cli.py bench-checkpointer [--plans 2000] [--max-rss-growth-mb 20]
+    python cli.py bench-explainer [--plans 20] [--sizes 5,12]
+    python cli.py bench-bulk [--plans 5000] [--chunk-sizes 10,100,1000] [--max-memory-mb 64]
+    python cli.py bench-workflow [--requests 50] [--concurrency 10] [--baseline results.json]
+    python cli.py bench-portfolio [--plans 10000] [--investments 5]
+    python cli.py ensure-indexes
+    python cli.py migrate-plans
+    python cli.py rebuild-rollups
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+def render_graph_command(args) -> int:
+    from graph import render_graph
+
+    path = render_graph(args.output)
+    print(f"Graph saved as '{path}'")
+    return 0
+
+def bench_startup_command(args) -> int:
+    """Time a cold `import main` in a fresh interpreter, the way a worker boots."""
+    timings = []
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    print(f"import main: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    if args.budget and median > args.budget:
+        print(f"❌ Startup time is over the {args.budget:.3f}s budget")
+        return 1
+    return 0
+
+def _sample_plan_document(investments: int) -> dict:
+    from datetime import datetime
+    from bson import ObjectId
+
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "user_id": "bench-user",
+        "user_context": {"country": "Argentina", "investmentProfile": "moderate", "age": 30},
+        "message": "Tengo 6000 dolares para invertir a largo plazo",
+        "likes": ["futbol", "tecnologia"],
+        "investments": [
+            {"name": f"Investment {i}", "amount": 100.0, "percentage": 100 / investments, "reason": "Diversification " * 10,
+             "risk": 5, "ease_of_use": 5, "explanation": "Explanation sentence. " * 40}
+            for i in range(investments)
+        ],
+        "status": "done",
+        "progress": None,
+        "error": None,
+        "idempotency_key": None,
+        "schema_version": 2,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def bench_serialization_command(args) -> int:
+    """Per-request cost of turning a stored plan into a GET /plan/{plan_id} body."""
+    from typing import Any, Dict
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from database import plan_document_view
+    from models import InvestmentPlan
+
+    response_field = create_model_field(name="response", type_=Dict[str, Any], mode="serialization")
+
+    async def validated(doc):
+        # The previous path: validate, dump, revalidate against response_model, encode
+        plan = InvestmentPlan(**{**doc, "_id": str(doc["_id"])})
+        content = await serialize_response(field=response_field, response_content=plan.model_dump())
+        return JSONResponse(jsonable_encoder(content)).body
+
+    async def trusted(doc):
+        return ORJSONResponse(plan_document_view(doc)).body
+
+    async def measure(path, investments):
+        # Documents are copied so each run starts from a fresh driver result
+        docs = [_sample_plan_document(investments) for _ in range(args.iterations)]
+        started = time.perf_counter()
+        for doc in docs:
+            await path(doc)
+        return (time.perf_counter() - started) / args.iterations * 1e6
+
+    async def run():
+        print(f"{'investments':>11} {'validated (us)':>15} {'trusted (us)':>13} {'speedup':>8}")
+        for investments in args.sizes:
+            before = await measure(validated, investments)
+            after = await measure(trusted, investments)
+            print(f"{investments:>11} {before:>15.1f} {after:>13.1f} {before / after:>7.1f}x")
+
+    asyncio.run(run())
+    return 0
+
+def bench_concurrency_command(args) -> int:
+    """Plan throughput with a stub model, one at a time against many in flight (see benchmarks/concurrency.py)."""
+    from benchmarks.concurrency import configure_environment, run_benchmark
+
+    configure_environment(args.latency)
+    results = asyncio.run(run_benchmark(args.plans, args.concurrency))
+    print(f"{'concurrency':>11} {'plans':>6} {'seconds':>8} {'plans/s':>8}")
+    for result in results.values():
+        print(f"{result['concurrency']:>11} {result['plans']:>6} {result['seconds']:>8.2f} {result['throughput_pps']:>8.2f}")
+    speedup = results["concurrent"]["throughput_pps"] / results["sequential"]["throughput_pps"]
+    print(f"Throughput at concurrency {args.concurrency} is {speedup:.1f}x the sequential throughput")
+    if speedup < args.min_speedup:
+        print(f"❌ Throughput doesn't scale with concurrency (expected at least {args.min_speedup:.1f}x)")
+        return 1
+    return 0
+
+def bench_checkpointer_command(args) -> int:
+    """RSS and saver size over thousands of stubbed plans with the memory checkpointer (see benchmarks/checkpointer.py)."""
+    from benchmarks.checkpointer import configure_environment, run_soak
+
+    configure_environment(args.max_threads, args.max_bytes)
+    samples = asyncio.run(run_soak(args.plans, args.concurrency))
+    print(f"{'plans':>6} {'rss (MB)':>9} {'threads':>8} {'saver (KB)':>11} {'evicted':>8}")
+    for sample in samples:
+        print(f"{sample['plans']:>6} {sample['rss_bytes'] / 2**20:>9.1f} {sample['threads']:>8} {sample['bytes'] / 1024:>11.1f} {sample['evicted_threads']:>8}")
+
+    failed = False
+    growth = (samples[-1]["rss_bytes"] - samples[0]["rss_bytes"]) / 2**20
+    print(f"RSS grew {growth:.1f} MB over {samples[-1]['plans']} plans")
+    if growth > args.max_rss_growth_mb:
+        print(f"❌ RSS grew more than {args.max_rss_growth_mb:.1f} MB")
+        failed = True
+    # One thread may go over the budget on its own, it is only evicted once another one writes
+    if any(sample["threads"] > args.max_threads or sample["bytes"] > args.max_bytes * 1.1 for sample in samples):
+        print("❌ The checkpointer went over its thread or byte budget")
+        failed = True
+    return 1 if failed else 0
+
+def bench_explainer_command(args) -> int:
+    """LLM calls, tokens and plan latency of the fanout and batch explainer modes (see benchmarks/explainer.py)."""
+    from benchmarks.explainer import configure_environment, run_benchmark
+
+    configure_environment()
+    results = asyncio.run(run_benchmark(args.plans, args.sizes, args.latency, args.latency_per_token))
+    print(f"{'investments':>11} {'mode':>7} {'calls':>6} {'prompt tok':>11} {'output tok':>11} {'p50 (s)':>8} {'max (s)':>8}")
+    for result in results:
+        print(
+            f"{result['investments']:>11} {result['mode']:>7} {result['calls_per_plan']:>6.1f} {result['input_tokens_per_plan']:>11} "
+            f"{result['output_tokens_per_plan']:>11} {result['p50_seconds']:>8.2f} {result['max_seconds']:>8.2f}"
+        )
+    print(f"Per plan, {args.plans} concurrent plans")
+    return 0
+
+def bench_bulk_command(args) -> int:
+    """Bulk plan ingestion throughput per chunk size and peak memory on a streamed input (see benchmarks/bulk.py)."""
+    from benchmarks.bulk import run_benchmark
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    results = asyncio.run(run_benchmark(args.plans, args.chunk_sizes, args.memory_plans, args.memory_chunk_size, args.mongodb_uri))
+    print(f"{'path':>10} {'chunk':>6} {'plans':>7} {'plans/s':>9}")
+    for result in results["throughput"]:
+        print(f"{result['path']:>10} {result['chunk_size']:>6} {result['plans']:>7} {result['plans_per_second']:>9.1f}")
+    for result in results["memory"]:
+        print(f"Streaming {result['plans']} plans in chunks of {result['chunk_size']}: peak {result['peak_bytes'] / 2**20:.1f} MB traced")
+
+    peak = results["memory"][-1]["peak_bytes"] / 2**20
+    if peak > args.max_memory_mb:
+        print(f"❌ Bulk ingestion peaked over {args.max_memory_mb:.0f} MB, it should only hold one chunk at a time")
+        return 1
+    return 0
+
+def bench_workflow_command(args) -> int:
+    """Latency percentiles and throughput of the plan endpoints, offline (see benchmarks/workflow.py)."""
+    from benchmarks.workflow import configure_environment, find_regressions, format_results, load_results, run_benchmark, save_results
+
+    configure_environment(args.fixtures, args.latency, args.latency_scale)
+    results = asyncio.run(run_benchmark(args.scenarios, args.requests, args.concurrency, args.mongodb_uri))
+    print(format_results(results))
+    if args.output:
+        save_results(args.output, results)
+    if args.baseline:
+        regressions = find_regressions(results, load_results(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression over {args.tolerance:.0%}: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+def bench_portfolio_command(args) -> int:
+    """Cost of repairing planner output, batched against per plan (see benchmarks/portfolio.py)."""
+    from benchmarks.portfolio import run_benchmark
+
+    result = run_benchmark(args.plans, args.investments, args.repeats, args.seed)
+    print(f"{'path':>9} {'total (ms)':>11} {'per plan (us)':>14}")
+    print(f"{'batched':>9} {result['batched_ms']:>11.1f} {result['batched_us_per_plan']:>14.1f}")
+    print(f"{'per plan':>9} {result['per_plan_ms']:>11.1f} {result['per_plan_us_per_plan']:>14.1f}")
+    print(f"{result['plans']} plans of {result['investments']} investments, batched is {result['per_plan_ms'] / result['batched_ms']:.1f}x faster")
+    return 0
+
+def ensure_indexes_command(args) -> int:
+    """Create the indexes an existing database is missing (see database.ensure_indexes)."""
+    from database import INDEXES, Database, ensure_indexes
+
+    async def run():
+        os.environ["MONGO_ENSURE_INDEXES"] = "false"
+        await Database.connect_db()
+        try:
+            return await ensure_indexes()
+        finally:
+            await Database.close_db()
+
+    created = asyncio.run(run())
+    for collection_name, names in created.items():
+        print(f"✅ {collection_name}: {', '.join(names)}")
+    failed = sorted(set(INDEXES) - set(created))
+    if failed:
+        print(f"❌ Failed to create the indexes of: {', '.join(failed)}")
+        return 1
+    return 0
+
+def migrate_plans_command(args) -> int:
+    """Rewrite stored plans to the compact schema (see database.migrate_plan_documents)."""
+    from database import Database, migrate_plan_documents
+
+    async def run():
+        await Database.connect_db()
+        try:
+            return await migrate_plan_documents()
+        finally:
+            await Database.close_db()
+
+    migrated = asyncio.run(run())
+    print(f"✅ Migrated {migrated} investment plans to the compact schema")
+    return 0
+
+def rebuild_rollups_command(args) -> int:
+    """Recompute the analytics rollups (see database.rebuild_investment_rollups)."""
+    from database import Database, rebuild_investment_rollups
+
+    async def run():
+        await Database.connect_db()
+        try:
+            return await rebuild_investment_rollups()
+        finally:
+            await Database.close_db()
+
+    counts = asyncio.run(run())
+    print(f"✅ Rebuilt rollups for {counts['investments']} investments and {counts['user_investments']} user investments")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Open-Invest maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    render = subparsers.add_parser("render-graph", help="Render the workflow diagram as a PNG (needs network access)")
+    render.add_argument("--output", default="investment_workflow.png")
+    render.set_defaults(func=render_graph_command)
+
+    bench = subparsers.add_parser("bench-startup", help="Measure how long importing the app takes")
+    bench.add_argument("--runs", type=int, default=5)
+    bench.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0")),
+                       help="Fail if the median import time is over this many seconds (0 to disable)")
+    bench.set_defaults(func=bench_startup_command)
+
+    serialization = subparsers.add_parser("bench-serialization", help="Measure the cost of serializing plan responses")
+    serialization.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[5, 20, 100],
+                               help="Comma separated numbers of investments per plan")
+    serialization.add_argument("--iterations", type=int, default=1000)
+    serialization.set_defaults(func=bench_serialization_command)
+
+    concurrency = subparsers.add_parser("bench-concurrency", help="Check that plan throughput scales with concurrency, with a stub model")
+    concurrency.add_argument("--plans", type=int, default=40, help="Plans run at the target concurrency")
+    concurrency.add_argument("--concurrency", type=int, default=10)
+    concurrency.add_argument("--latency", type=float, default=0.2, help="Seconds the stub model sleeps per call")
+    concurrency.add_argument("--min-speedup", type=float, default=4.0,
+                             help="Fail if throughput at --concurrency is under this multiple of the sequential throughput")
+    concurrency.set_defaults(func=bench_concurrency_command)
+
+    checkpointer = subparsers.add_parser("bench-checkpointer", help="Soak test the memory checkpointer with stubbed plans")
+    checkpointer.add_argument("--plans", type=int, default=2000)
+    checkpointer.add_argument("--concurrency", type=int, default=20)
+    checkpointer.add_argument("--max-threads", type=int, default=200, help="Thread budget of the checkpointer under test")
+    checkpointer.add_argument("--max-bytes", type=int, default=4 * 1024 * 1024, help="Byte budget of the checkpointer under test")
+    checkpointer.add_argument("--max-rss-growth-mb", type=float, default=20.0,
+                              help="Fail if RSS grows more than this after the warm-up")
+    checkpointer.set_defaults(func=bench_checkpointer_command)
+
+    explainer = subparsers.add_parser("bench-explainer", help="Compare the fanout and batch explainer modes with a stub model")
+    explainer.add_argument("--plans", type=int, default=20, help="Concurrent plans per mode and size")
+    explainer.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[5, 12],
+                           help="Comma separated numbers of investments per plan")
+    explainer.add_argument("--latency", type=float, default=0.3, help="Seconds the stub model takes per call")
+    explainer.add_argument("--latency-per-token", type=float, default=0.004, help="Extra seconds per output token")
+    explainer.set_defaults(func=bench_explainer_command)
+
+    bulk = subparsers.add_parser("bench-bulk", help="Measure bulk plan ingestion throughput and memory")
+    bulk.add_argument("--plans", type=int, default=5000, help="Plans written per path and chunk size")
+    bulk.add_argument("--chunk-sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10, 100, 1000],
+                      help="Comma separated chunk sizes")
+    bulk.add_argument("--memory-plans", type=int, default=50000, help="Plans streamed for the memory check")
+    bulk.add_argument("--memory-chunk-size", type=int, default=1000)
+    bulk.add_argument("--max-memory-mb", type=float, default=64.0,
+                      help="Fail if the peak traced memory of the streamed import is over this")
+    bulk.add_argument("--mongodb-uri", default=None, help="Benchmark against this MongoDB instead of an in-memory stand-in")
+    bulk.set_defaults(func=bench_bulk_command)
+
+    from benchmarks.workflow import FIXTURES_DIR, SCENARIOS
+
+    workflow = subparsers.add_parser("bench-workflow", help="Benchmark the plan endpoints with replayed LLM responses")
+    workflow.add_argument("--requests", type=int, default=50, help="Requests per scenario")
+    workflow.add_argument("--concurrency", type=int, default=10)
+    workflow.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                          help=f"Comma separated scenarios, out of {','.join(SCENARIOS)}")
+    workflow.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of recorded LLM responses")
+    workflow.add_argument("--latency", choices=["recorded", "sampled", "lognormal", "none"], default="recorded",
+                          help="How replayed LLM calls simulate latency")
+    workflow.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on the simulated LLM latency")
+    workflow.add_argument("--mongodb-uri", default=None, help="Benchmark against this MongoDB instead of an in-memory stand-in")
+    workflow.add_argument("--output", default=None, help="Save the results as JSON")
+    workflow.add_argument("--baseline", default=None, help="Fail on regressions against results saved with --output")
+    workflow.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/throughput regression against the baseline")
+    workflow.set_defaults(func=bench_workflow_command)
+
+    portfolio = subparsers.add_parser("bench-portfolio", help="Measure the cost of normalizing batches of plans")
+    portfolio.add_argument("--plans", type=int, default=10000)
+    portfolio.add_argument("--investments", type=int, default=5, help="Investments per plan")
+    portfolio.add_argument("--repeats", type=int, default=3)
+    portfolio.add_argument("--seed", type=int, default=0)
+    portfolio.set_defaults(func=bench_portfolio_command)
+
+    indexes = subparsers.add_parser("ensure-indexes", help="Create the MongoDB indexes an existing database is missing")
+    indexes.set_defaults(func=ensure_indexes_command)
+
+    migrate = subparsers.add_parser("migrate-plans", help="Migrate stored plans to the compact schema")
+    migrate.set_defaults(func=migrate_plans_command)
+
+    rollups = subparsers.add_parser("rebuild-rollups", help="Recompute the investment analytics rollups from stored plans")
+    rollups.set_defaults(func=rebuild_rollups_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
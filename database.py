@@ -1,61 +1,336 @@
+import asyncio
+import base64
+import logging
 import os
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Dict, Any, Union
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-from models import User, UserCreate, InvestmentPlan, InvestmentPlanCreate, InvestmentAmount
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, ReplaceOne, ReturnDocument, UpdateOne, monitoring, read_preferences
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from cache import ReadThroughCache, create_cache_backend
+from models import User, UserCreate, InvestmentPlan, upgrade_plan_document, InvestmentPlanCreate, InvestmentPlanSummary, InvestmentAmount, PLAN_SCHEMA_VERSION
+
+logger = logging.getLogger("open_invest.database")
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection pool events, since pymongo doesn't expose pool stats."""
+
+    def __init__(self) -> None:
+        self.pools = 0
+        self.open = 0
+        self.checked_out = 0
+        self.created = 0
+        self.closed = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def pool_created(self, event) -> None:
+        self.pools += 1
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self.pool_clears += 1
+
+    def pool_closed(self, event) -> None:
+        self.pools -= 1
+
+    def connection_created(self, event) -> None:
+        self.created += 1
+        self.open += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self.closed += 1
+        self.open -= 1
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event) -> None:
+        self.checked_out += 1
+
+    def connection_checked_in(self, event) -> None:
+        self.checked_out -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pools": self.pools,
+            "open_connections": self.open,
+            "in_use": self.checked_out,
+            "created": self.created,
+            "closed": self.closed,
+            "checkout_failures": self.checkout_failures,
+            "pool_clears": self.pool_clears,
+        }
+
+# Client options read from the environment. Unset ones are left out, so the
+# driver defaults (or the options in MONGODB_URI) apply.
+_CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+    "MONGO_READ_PREFERENCE": ("readPreference", str),
+    "MONGO_APP_NAME": ("appname", str),
+}
+
+# Indexes the queries rely on, by collection. mongo-init.js creates the same
+# ones on a fresh data directory; ensure_indexes creates any that are missing
+# on an existing one.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("country", ASCENDING)]),
+        IndexModel([("investment_profile", ASCENDING)]),
+    ],
+    "investment_plans": [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        # Covers the (created_at, _id) keyset sort of the paginated user plan summaries
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("idempotency_key", ASCENDING)], unique=True, partialFilterExpression={"idempotency_key": {"$type": "string"}}),
+    ],
+    "investments": [
+        IndexModel([("risk", ASCENDING)]),
+        IndexModel([("ease_of_use", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    # Expired cache entries and digests are removed by the TTL monitor
+    "explanation_cache": [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)],
+    "news_digests": [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)],
+    "investment_rollups": [IndexModel([("mentions", DESCENDING)])],
+    "user_investment_rollups": [IndexModel([("user_id", ASCENDING), ("total_amount", DESCENDING)])],
+}
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    pool_stats = PoolStats()
+
+    @classmethod
+    def client_options(cls) -> Dict[str, Any]:
+        """Motor client options from the MONGO_* environment variables."""
+        options: Dict[str, Any] = {"appname": "open-invest"}
+        for env_name, (option, cast) in _CLIENT_OPTIONS.items():
+            value = os.getenv(env_name)
+            if value:
+                options[option] = cast(value)
+        return options
 
     @classmethod
     async def connect_db(cls):
         """Create database connection."""
         mongodb_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/investing_agent")
-        cls.client = AsyncIOMotorClient(mongodb_uri)
+        cls.pool_stats = PoolStats()
+        cls.client = AsyncIOMotorClient(mongodb_uri, event_listeners=[cls.pool_stats], **cls.client_options())
         cls.db = cls.client.investing_agent
-        print(f"✅ Connected to MongoDB: {mongodb_uri}")
+        try:
+            latency_ms = await cls.ping()
+            logger.info("Connected to MongoDB: %s (%.1f ms)", mongodb_uri, latency_ms)
+        except Exception as e:
+            # The client keeps retrying, /health reports it until the server is reachable
+            logger.warning("MongoDB is not reachable yet: %s", e)
+            return
+        if os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true":
+            await ensure_indexes()
 
     @classmethod
     async def close_db(cls):
         """Close database connection."""
         if cls.client:
             cls.client.close()
-            print("✅ MongoDB connection closed")
+            logger.info("MongoDB connection closed")
 
     @classmethod
     async def get_collection(cls, collection_name: str):
         """Get a collection from the database."""
         return cls.db[collection_name]
 
+    @classmethod
+    async def get_analytics_collection(cls, collection_name: str):
+        """Get a collection for analytics reads, with MONGO_ANALYTICS_READ_PREFERENCE.
+
+        Analytics tolerate slightly stale data, so by default they are read
+        from a secondary when one is available.
+        """
+        mode = os.getenv("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+        read_preference = read_preferences.make_read_preference(read_preferences.read_pref_mode_from_name(mode), None)
+        return cls.db.get_collection(collection_name, read_preference=read_preference)
+
+    @classmethod
+    async def ping(cls, timeout: Optional[float] = None) -> float:
+        """Round trip a ping to the server and return the latency in milliseconds."""
+        timeout = timeout if timeout is not None else float(os.getenv("MONGO_HEALTH_TIMEOUT_SECONDS", "2"))
+        started = time.perf_counter()
+        await asyncio.wait_for(cls.client.admin.command("ping"), timeout)
+        return (time.perf_counter() - started) * 1000
+
+    @classmethod
+    async def health(cls) -> Dict[str, Any]:
+        """Ping the database and report the connection pool."""
+        if cls.client is None:
+            return {"status": "disconnected", "error": "Database is not connected"}
+        try:
+            latency_ms = await cls.ping()
+        except Exception as e:
+            return {"status": "unreachable", "error": str(e) or type(e).__name__, "pool": cls.pool_stats.stats()}
+        return {
+            "status": "connected",
+            "latency_ms": round(latency_ms, 2),
+            "pool": {**cls.pool_stats.stats(), "max_pool_size": cls.client.options.pool_options.max_pool_size},
+        }
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create the INDEXES that are missing, returning their names by collection.
+
+    Creating an index that already exists with the same options is a no-op,
+    so this is safe on every start. A collection whose indexes can't be
+    created (e.g. duplicate emails for the unique index) is logged and
+    skipped, so it never stops the app from starting.
+    """
+    created: Dict[str, List[str]] = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            collection = await Database.get_collection(collection_name)
+            created[collection_name] = await collection.create_indexes(indexes)
+        except Exception as e:
+            logger.warning("Failed to create the %s indexes: %s", collection_name, e)
+    return created
+
+# Read-through caches for the hottest single-document reads. Plans are cached
+# as trusted documents and users as models; either may be shared between
+# callers, so treat them as read-only.
+READ_CACHE_TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", "60"))
+plan_read_cache = ReadThroughCache("plan", None, create_cache_backend(), READ_CACHE_TTL_SECONDS)
+user_read_cache = ReadThroughCache("user", User, create_cache_backend(), READ_CACHE_TTL_SECONDS)
+
+def _plan_cache_keys(plan_id: str, update_data: Optional[Dict[str, Any]] = None) -> List[str]:
+    """The cached views of a plan, or only those an update of `update_data` changes.
+
+    The summary view leaves the explanations out, so an update that only
+    fills in explanations (`investments.<i>.explanation`) doesn't touch it.
+    """
+    full_key, summary_key = f"plan:{plan_id}:full", f"plan:{plan_id}:summary"
+    if update_data is not None and all(_is_explanation_field(field) for field in update_data if field != "updated_at"):
+        return [full_key]
+    return [full_key, summary_key]
+
+def _is_explanation_field(field: str) -> bool:
+    parts = field.split(".")
+    return field == "explained_investments" or (
+        len(parts) == 3 and parts[0] == "investments" and parts[1].isdigit() and parts[2] == "explanation"
+    )
+
 # User operations
-async def create_user(user_data: UserCreate) -> User:
-    """Create a new user."""
-    collection = await Database.get_collection("users")
-    
-    # Check if user already exists
-    existing_user = await collection.find_one({"email": user_data.email})
-    if existing_user:
-        raise ValueError("User with this email already exists")
-    
+DUPLICATE_USER_ERROR = "User with this email already exists"
+
+def _user_upsert(user_data: UserCreate):
+    """Insert-if-absent on email: the single atomic write behind user creation.
+
+    Returns the (filter, update) pair for an upsert, and the document that
+    is inserted when no user has that email yet.
+    """
     user_dict = user_data.model_dump()
     user_dict["created_at"] = datetime.utcnow()
-    user_dict["updated_at"] = datetime.utcnow()
+    user_dict["updated_at"] = user_dict["created_at"]
+    return ({"email": user_dict["email"]}, {"$setOnInsert": user_dict}), user_dict
+
+async def create_user(user_data: UserCreate) -> User:
+    """Create a new user, raising ValueError if the email is taken."""
+    collection = await Database.get_collection("users")
     
-    result = await collection.insert_one(user_dict)
-    user_dict["_id"] = str(result.inserted_id)
+    upsert, user_dict = _user_upsert(user_data)
+    try:
+        result = await collection.update_one(*upsert, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent signup with the same email won the upsert race
+        raise ValueError(DUPLICATE_USER_ERROR)
+    if result.upserted_id is None:
+        raise ValueError(DUPLICATE_USER_ERROR)
     
+    user_dict["_id"] = str(result.upserted_id)
     return User(**user_dict)
 
+async def _upsert_user_chunk(collection, chunk: List[Any], indexes: List[int]) -> List[Dict[str, Any]]:
+    """Upsert one chunk of users unordered and map the outcome back to input indexes."""
+    upserted: Dict[int, Any] = {}
+    errors: Dict[int, Dict[str, Any]] = {}
+    try:
+        result = await collection.bulk_write([UpdateOne(*upsert, upsert=True) for upsert in chunk], ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+        errors = {write_error["index"]: write_error for write_error in e.details.get("writeErrors", [])}
+
+    results = []
+    for position, index in enumerate(indexes):
+        if position in upserted:
+            results.append({"index": index, "success": True, "user_id": str(upserted[position])})
+        elif position in errors and errors[position].get("code") != 11000:
+            results.append({"index": index, "success": False, "error": errors[position].get("errmsg", "Write failed")})
+        else:
+            # Matched an existing user, or lost the race to a concurrent upsert
+            results.append({"index": index, "success": False, "error": DUPLICATE_USER_ERROR})
+    return results
+
+async def create_users_bulk(
+    users: Union[Iterable[Any], AsyncIterable[Any]],
+    chunk_size: int = 1000
+) -> AsyncIterator[Dict[str, Any]]:
+    """Create users in unordered bulk_write chunks of the create_user upsert.
+
+    Works like create_investment_plans_bulk: takes UserCreate items (or
+    Exceptions for items that failed to parse) and yields
+    {"index", "success", "user_id"} or {"index", "success", "error"} per
+    input item. Emails that already exist fail with the same error as
+    create_user.
+    """
+    collection = await Database.get_collection("users")
+
+    chunk: List[Any] = []
+    indexes: List[int] = []
+    async for index, user_data in _aenumerate(users):
+        if isinstance(user_data, Exception):
+            yield {"index": index, "success": False, "error": str(user_data)}
+            continue
+
+        chunk.append(_user_upsert(user_data)[0])
+        indexes.append(index)
+        if len(chunk) >= chunk_size:
+            for result in await _upsert_user_chunk(collection, chunk, indexes):
+                yield result
+            chunk, indexes = [], []
+
+    if chunk:
+        for result in await _upsert_user_chunk(collection, chunk, indexes):
+            yield result
+
 async def get_user_by_email(email: str) -> Optional[User]:
     """Get user by email."""
-    collection = await Database.get_collection("users")
-    user_data = await collection.find_one({"email": email})
-    if user_data:
-        user_data["_id"] = str(user_data["_id"])
-        return User(**user_data)
-    return None
+    async def load() -> Optional[User]:
+        collection = await Database.get_collection("users")
+        user_data = await collection.find_one({"email": email})
+        if user_data:
+            user_data["_id"] = str(user_data["_id"])
+            return User(**user_data)
+        return None
+
+    return await user_read_cache.get(f"user:{email}", load)
 
 async def get_user_by_id(user_id: str) -> Optional[User]:
     """Get user by ID."""
@@ -75,14 +350,98 @@ async def create_investment_plan(plan_data: InvestmentPlanCreate) -> InvestmentP
     collection = await Database.get_collection("investment_plans")
     
     plan_dict = plan_data.model_dump()
+    plan_dict["schema_version"] = PLAN_SCHEMA_VERSION
     plan_dict["created_at"] = datetime.utcnow()
     plan_dict["updated_at"] = datetime.utcnow()
     
     result = await collection.insert_one(plan_dict)
     plan_dict["_id"] = str(result.inserted_id)
+    await apply_investment_rollups([plan_dict])
     
     return InvestmentPlan(**plan_dict)
 
+async def _aenumerate(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    """enumerate() over a sync or async iterable."""
+    index = 0
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield index, item
+            index += 1
+    else:
+        for item in items:
+            yield index, item
+            index += 1
+
+async def _insert_plan_chunk(collection, chunk: List[Dict[str, Any]], indexes: List[int]) -> List[Dict[str, Any]]:
+    """Insert one chunk unordered and map the outcome back to input indexes."""
+    now = datetime.utcnow()
+    for doc in chunk:
+        doc["created_at"] = now
+        doc["updated_at"] = now
+
+    errors: Dict[int, str] = {}
+    try:
+        await collection.insert_many(chunk, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            errors[write_error["index"]] = write_error.get("errmsg", "Write failed")
+
+    results = []
+    inserted = []
+    for position, (index, doc) in enumerate(zip(indexes, chunk)):
+        if position in errors:
+            results.append({"index": index, "success": False, "error": errors[position]})
+        else:
+            # insert_many assigns the _id on the document client side
+            results.append({"index": index, "success": True, "plan_id": str(doc["_id"])})
+            inserted.append(doc)
+    await apply_investment_rollups(inserted)
+    return results
+
+async def create_investment_plans_bulk(
+    plans: Union[Iterable[Any], AsyncIterable[Any]],
+    chunk_size: int = 1000
+) -> AsyncIterator[Dict[str, Any]]:
+    """Insert investment plans in unordered insert_many chunks.
+
+    Accepts a sync or async iterable of InvestmentPlanCreate (or an
+    Exception standing in for an item that failed to parse) and yields one
+    result per input item, tagged with its input index:
+    {"index", "success", "plan_id"} or {"index", "success", "error"}.
+    Only one chunk is held in memory at a time, so arbitrarily long streams
+    can be ingested.
+    """
+    collection = await Database.get_collection("investment_plans")
+
+    chunk: List[Dict[str, Any]] = []
+    indexes: List[int] = []
+    async for index, plan_data in _aenumerate(plans):
+        if isinstance(plan_data, Exception):
+            yield {"index": index, "success": False, "error": str(plan_data)}
+            continue
+
+        plan_dict = plan_data.model_dump()
+        plan_dict["schema_version"] = PLAN_SCHEMA_VERSION
+        chunk.append(plan_dict)
+        indexes.append(index)
+        if len(chunk) >= chunk_size:
+            for result in await _insert_plan_chunk(collection, chunk, indexes):
+                yield result
+            chunk, indexes = [], []
+
+    if chunk:
+        for result in await _insert_plan_chunk(collection, chunk, indexes):
+            yield result
+
+async def get_investment_plan_by_idempotency_key(idempotency_key: str) -> Optional[InvestmentPlan]:
+    """Get the investment plan saved for an idempotency key."""
+    collection = await Database.get_collection("investment_plans")
+    plan_data = await collection.find_one({"idempotency_key": idempotency_key})
+    if plan_data:
+        plan_data["_id"] = str(plan_data["_id"])
+        return InvestmentPlan(**plan_data)
+    return None
+
 async def get_investment_plans_by_user(user_id: str, limit: int = 10) -> List[InvestmentPlan]:
     """Get investment plans for a specific user."""
     collection = await Database.get_collection("investment_plans")
@@ -99,74 +458,438 @@ async def get_investment_plans_by_user(user_id: str, limit: int = 10) -> List[In
     except:
         return []
 
-async def get_investment_plan_by_id(plan_id: str) -> Optional[InvestmentPlan]:
+def encode_plan_cursor(created_at: datetime, plan_id: str) -> str:
+    """Opaque keyset cursor for the (created_at, _id) position of a plan."""
+    raw = f"{created_at.isoformat()}|{plan_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_plan_cursor(cursor: str):
+    """Inverse of encode_plan_cursor, raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, plan_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(plan_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+async def get_investment_plan_summaries(user_id: str, limit: int = 10, cursor: Optional[str] = None):
+    """Get a page of lightweight plan summaries for a user, newest first.
+
+    Uses keyset pagination on (created_at, _id) so every page is an index
+    range scan on (user_id, created_at, _id), with no in-memory sort, and
+    projects away the user context
+    and explanations. Returns the summaries and the cursor of the next page
+    (None on the last page).
+    """
+    collection = await Database.get_collection("investment_plans")
+
+    match: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        created_at, last_id = decode_plan_cursor(cursor)
+        match["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        # Fetch one extra document to know whether there is a next page
+        {"$limit": limit + 1},
+        {"$project": {
+            "user_id": 1,
+            "message": 1,
+            "status": {"$ifNull": ["$status", "done"]},
+            "created_at": 1,
+            "investment_names": {"$ifNull": ["$investments.name", []]},
+            "investment_count": {"$size": {"$ifNull": ["$investments", []]}},
+            "total_amount": {"$sum": "$investments.amount"}
+        }}
+    ]
+
+    summaries = []
+    async for plan_data in collection.aggregate(pipeline):
+        plan_data["_id"] = str(plan_data["_id"])
+        summaries.append(InvestmentPlanSummary(**plan_data))
+
+    next_cursor = None
+    if len(summaries) > limit:
+        summaries = summaries[:limit]
+        last = summaries[-1]
+        next_cursor = encode_plan_cursor(last.created_at, last.id)
+    return summaries, next_cursor
+
+# Defaults InvestmentPlan fills in for fields older documents may not have
+_PLAN_DOCUMENT_DEFAULTS = {"portfolio": None, "status": "done", "progress": None, "error": None, "idempotency_key": None, "schema_version": PLAN_SCHEMA_VERSION}
+
+def plan_document_view(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a stored plan like InvestmentPlan.model_dump(), without validating it.
+
+    Plans are validated before they are written, so documents read back from
+    our own collection are trusted and can be returned as they are.
+    """
+    if "explained_investments" in plan_data:
+        plan_data = upgrade_plan_document(plan_data)
+    plan = {"id": str(plan_data.pop("_id")), **plan_data}
+    for field, default in _PLAN_DOCUMENT_DEFAULTS.items():
+        plan.setdefault(field, default)
+    for investment in plan.get("investments") or []:
+        investment.setdefault("explanation", None)
+    return plan
+
+async def get_investment_plan_document(plan_id: str, include_explanations: bool = True) -> Optional[Dict[str, Any]]:
+    """Get a plan as a trusted document (see plan_document_view).
+
+    With include_explanations=False the explanations are left out by the
+    query projection; fetch them with get_investment_plan_explanations.
+    Documents may come from the read cache and be shared, so don't mutate
+    them.
+    """
+    async def load() -> Optional[Dict[str, Any]]:
+        collection = await Database.get_collection("investment_plans")
+        projection = None
+        if not include_explanations:
+            projection = {"investments.explanation": 0, "explained_investments": 0}
+        try:
+            plan_data = await collection.find_one({"_id": ObjectId(plan_id)}, projection)
+        except:
+            return None
+        return plan_document_view(plan_data) if plan_data else None
+
+    full_key, summary_key = _plan_cache_keys(plan_id)
+    return await plan_read_cache.get(full_key if include_explanations else summary_key, load)
+
+async def get_investment_plan_by_id(plan_id: str, include_explanations: bool = True) -> Optional[InvestmentPlan]:
     """Get investment plan by ID."""
+    plan_data = await get_investment_plan_document(plan_id, include_explanations)
+    return InvestmentPlan(**plan_data) if plan_data else None
+
+async def get_investment_plan_explanations(plan_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Get only the investment names and explanations of a plan."""
     collection = await Database.get_collection("investment_plans")
     try:
-        plan_data = await collection.find_one({"_id": ObjectId(plan_id)})
-        if plan_data:
-            plan_data["_id"] = str(plan_data["_id"])
-            return InvestmentPlan(**plan_data)
+        plan_data = await collection.find_one(
+            {"_id": ObjectId(plan_id)},
+            {"investments.name": 1, "investments.explanation": 1,
+             "explained_investments.name": 1, "explained_investments.explanation": 1}
+        )
     except:
-        pass
-    return None
+        return None
+    if not plan_data:
+        return None
+    investments = plan_data.get("investments") or []
+    # Version 1 documents may only have the explanations in explained_investments
+    explained = plan_data.get("explained_investments") or []
+    if len(explained) >= len(investments):
+        investments = explained
+    return [
+        {"name": investment.get("name"), "explanation": investment.get("explanation")}
+        for investment in investments
+    ]
+
+async def migrate_plan_documents() -> int:
+    """Rewrite version 1 plan documents to the compact version 2 schema.
+
+    Keeps a single investments list (taking the explained copy when it's
+    complete) and drops explained_investments. Safe to run repeatedly.
+    """
+    collection = await Database.get_collection("investment_plans")
+    result = await collection.update_many(
+        {"explained_investments": {"$exists": True}},
+        [
+            {"$set": {
+                "investments": {"$cond": [
+                    {"$gte": [
+                        {"$size": {"$ifNull": ["$explained_investments", []]}},
+                        {"$size": {"$ifNull": ["$investments", []]}}
+                    ]},
+                    "$explained_investments",
+                    "$investments"
+                ]},
+                "schema_version": PLAN_SCHEMA_VERSION
+            }},
+            {"$project": {"explained_investments": 0}}
+        ]
+    )
+    return result.modified_count
 
 async def update_investment_plan(plan_id: str, update_data: Dict[str, Any]) -> bool:
-    """Update an investment plan."""
+    """Update an investment plan.
+
+    Only an update that replaces `investments` reads the previous ones and
+    applies a rollup delta; status, progress and explanations
+    (`investments.<i>.explanation`) are plain writes. Only the cached views
+    the update changes are invalidated (see _plan_cache_keys).
+    """
     collection = await Database.get_collection("investment_plans")
     
     update_data["updated_at"] = datetime.utcnow()
     try:
-        result = await collection.update_one(
+        if "investments" not in update_data:
+            result = await collection.update_one(
+                {"_id": ObjectId(plan_id)},
+                {"$set": update_data}
+            )
+            return result.modified_count > 0
+
+        # The investments change, so the rollups need the previous ones too
+        previous = await collection.find_one_and_update(
             {"_id": ObjectId(plan_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"user_id": 1, "investments": 1},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.modified_count > 0
+        if previous is None:
+            return False
+        await apply_investment_rollups([previous], sign=-1, replaced_by=[{
+            "user_id": previous.get("user_id"),
+            "investments": update_data["investments"]
+        }])
+        return True
     except:
         return False
+    finally:
+        # After the write, so a read racing it can't cache the old plan
+        await plan_read_cache.invalidate(*_plan_cache_keys(plan_id, update_data))
 
 async def delete_investment_plan(plan_id: str) -> bool:
     """Delete an investment plan."""
     collection = await Database.get_collection("investment_plans")
     try:
-        result = await collection.delete_one({"_id": ObjectId(plan_id)})
-        return result.deleted_count > 0
+        deleted = await collection.find_one_and_delete(
+            {"_id": ObjectId(plan_id)},
+            projection={"user_id": 1, "investments": 1}
+        )
+        if deleted is None:
+            return False
+        await apply_investment_rollups([deleted], sign=-1)
+        return True
     except:
         return False
+    finally:
+        await plan_read_cache.invalidate(*_plan_cache_keys(plan_id))
+
+# Explanation cache operations
+async def get_cached_explanation(cache_key: str) -> Optional[str]:
+    """Get a cached explanation if it exists and hasn't expired."""
+    collection = await Database.get_collection("explanation_cache")
+    doc = await collection.find_one(
+        {"_id": cache_key, "expires_at": {"$gt": datetime.utcnow()}},
+        {"explanation": 1}
+    )
+    return doc["explanation"] if doc else None
+
+async def save_cached_explanation(cache_key: str, explanation: str, ttl_seconds: float) -> None:
+    """Store an explanation in the shared cache."""
+    collection = await Database.get_collection("explanation_cache")
+    now = datetime.utcnow()
+    await collection.update_one(
+        {"_id": cache_key},
+        {"$set": {
+            "explanation": explanation,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds)
+        }},
+        upsert=True
+    )
+
+async def get_news_digest(country_key: str) -> Optional[Dict[str, Any]]:
+    """Get a country's news digest if there's one and it hasn't expired."""
+    collection = await Database.get_collection("news_digests")
+    return await collection.find_one(
+        {"_id": country_key, "summary": {"$exists": True}, "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0, "lease_until": 0}
+    )
+
+async def save_news_digest(country_key: str, digest: Dict[str, Any], ttl_seconds: float) -> None:
+    """Store a country's news digest and release its refresh lease."""
+    collection = await Database.get_collection("news_digests")
+    now = datetime.utcnow()
+    await collection.update_one(
+        {"_id": country_key},
+        {"$set": {**digest, "expires_at": now + timedelta(seconds=ttl_seconds)}, "$unset": {"lease_until": ""}},
+        upsert=True
+    )
+
+async def claim_news_refresh(country_key: str, lease_seconds: float) -> bool:
+    """Take the refresh lease of a country, False when another replica holds it."""
+    collection = await Database.get_collection("news_digests")
+    now = datetime.utcnow()
+    try:
+        await collection.update_one(
+            {"_id": country_key, "$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lte": now}}]},
+            # A placeholder for a new country expires with its lease
+            {"$set": {"lease_until": now + timedelta(seconds=lease_seconds)},
+             "$setOnInsert": {"expires_at": now + timedelta(seconds=lease_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The document exists with a live lease, so the upsert tried to insert it again
+        return False
+    return True
 
 # Analytics and reporting
+#
+# investment_rollups (one document per investment name) and
+# user_investment_rollups (one per user and investment name) are kept up to
+# date as plans are created, updated and deleted, so the analytics reads
+# below only touch the documents they return. rebuild_investment_rollups
+# recomputes both from scratch.
+
+def rollup_key(name: Any) -> str:
+    """Key investments by name, ignoring case and extra whitespace."""
+    return " ".join(str(name or "").split()).lower()
+
+def _investment_contributions(plan: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Aggregate a plan's investments by rollup key."""
+    contributions: Dict[str, Dict[str, Any]] = {}
+    for investment in plan.get("investments") or []:
+        if hasattr(investment, "model_dump"):
+            investment = investment.model_dump()
+        key = rollup_key(investment.get("name"))
+        if not key:
+            continue
+        entry = contributions.setdefault(key, {
+            "name": investment.get("name"), "mentions": 0, "total_amount": 0.0, "total_percentage": 0.0
+        })
+        entry["mentions"] += 1
+        entry["total_amount"] += float(investment.get("amount") or 0)
+        entry["total_percentage"] += float(investment.get("percentage") or 0)
+    return contributions
+
+def _rollup_deltas(plans: List[Dict[str, Any]], sign: int, deltas=None):
+    """Accumulate the rollup changes of adding (sign=1) or removing (sign=-1) plans."""
+    global_deltas, user_deltas = deltas or ({}, {})
+    for plan in plans:
+        user_id = plan.get("user_id")
+        for key, entry in _investment_contributions(plan).items():
+            targets = [global_deltas.setdefault(key, {"name": entry["name"], "mentions": 0, "total_amount": 0.0, "total_percentage": 0.0})]
+            if user_id is not None:
+                targets.append(user_deltas.setdefault((user_id, key), {"name": entry["name"], "mentions": 0, "total_amount": 0.0, "total_percentage": 0.0}))
+            for target in targets:
+                target["mentions"] += sign * entry["mentions"]
+                target["total_amount"] += sign * entry["total_amount"]
+                target["total_percentage"] += sign * entry["total_percentage"]
+    return global_deltas, user_deltas
+
+def _rollup_update(delta: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "$inc": {
+            "mentions": delta["mentions"],
+            "total_amount": delta["total_amount"],
+            "total_percentage": delta["total_percentage"]
+        },
+        "$setOnInsert": {"name": delta["name"]}
+    }
+
+async def apply_investment_rollups(plans: List[Dict[str, Any]], sign: int = 1, replaced_by: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Add (sign=1) or remove (sign=-1) plans from the analytics rollups.
+
+    `replaced_by` adds the given plans in the same write, for updates that
+    swap a plan's investments.
+    """
+    deltas = _rollup_deltas(plans, sign)
+    if replaced_by:
+        deltas = _rollup_deltas(replaced_by, -sign, deltas)
+    global_deltas, user_deltas = deltas
+
+    global_ops = [
+        UpdateOne({"_id": key}, _rollup_update(delta), upsert=True)
+        for key, delta in global_deltas.items()
+        if delta["mentions"] or delta["total_amount"] or delta["total_percentage"]
+    ]
+    user_ops = [
+        UpdateOne({"_id": f"{user_id}|{key}"}, {**_rollup_update(delta), "$setOnInsert": {"name": delta["name"], "user_id": user_id}}, upsert=True)
+        for (user_id, key), delta in user_deltas.items()
+        if delta["mentions"] or delta["total_amount"] or delta["total_percentage"]
+    ]
+    try:
+        if global_ops:
+            await (await Database.get_collection("investment_rollups")).bulk_write(global_ops, ordered=False)
+        if user_ops:
+            await (await Database.get_collection("user_investment_rollups")).bulk_write(user_ops, ordered=False)
+    except Exception as e:
+        # Analytics must never fail a plan write, a rebuild fixes any drift
+        logger.warning("Failed to update investment rollups: %s", e)
+
+async def _rollup_mentions(collection, batch_size: int) -> Dict[str, Any]:
+    return {doc["_id"]: doc.get("mentions") async for doc in collection.find({}, {"mentions": 1}).batch_size(batch_size)}
+
+async def _replace_rollups(collection, docs: List[Dict[str, Any]], before: Dict[str, Any], batch_size: int) -> None:
+    """Make `collection` hold `docs`, key by key, without emptying it first.
+
+    Each rollup is replaced in place (upserted), then the keys of `before`
+    (the mentions per key before the plans were read) that aren't in `docs`
+    are deleted, unless a concurrent plan write has changed them since.
+    Readers never see an empty or half filled collection, and keys created
+    by writes during the rebuild are kept.
+    """
+    for start in range(0, len(docs), batch_size):
+        await collection.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs[start:start + batch_size]],
+            ordered=False
+        )
+    rebuilt = {doc["_id"] for doc in docs}
+    stale = [DeleteOne({"_id": key, "mentions": mentions}) for key, mentions in before.items() if key not in rebuilt]
+    for start in range(0, len(stale), batch_size):
+        await collection.bulk_write(stale[start:start + batch_size], ordered=False)
+
+async def rebuild_investment_rollups(batch_size: int = 1000) -> Dict[str, int]:
+    """Recompute both rollup collections from investment_plans.
+
+    The rollups stay readable throughout (see _replace_rollups). Plans
+    written while it runs may be counted by both the rebuild and their own
+    rollup update, so run it again once writes are quiet if exact counts
+    matter.
+    """
+    plans = await Database.get_collection("investment_plans")
+    rollups = await Database.get_collection("investment_rollups")
+    user_rollups = await Database.get_collection("user_investment_rollups")
+    rollups_before = await _rollup_mentions(rollups, batch_size)
+    user_rollups_before = await _rollup_mentions(user_rollups, batch_size)
+    global_deltas: Dict[str, Dict[str, Any]] = {}
+    user_deltas: Dict[Any, Dict[str, Any]] = {}
+    cursor = plans.find({}, {"user_id": 1, "investments.name": 1, "investments.amount": 1, "investments.percentage": 1}).batch_size(batch_size)
+    async for plan in cursor:
+        _rollup_deltas([plan], 1, (global_deltas, user_deltas))
+
+    global_docs = [
+        {"_id": key, "name": delta["name"], "mentions": delta["mentions"],
+         "total_amount": delta["total_amount"], "total_percentage": delta["total_percentage"]}
+        for key, delta in global_deltas.items()
+    ]
+    user_docs = [
+        {"_id": f"{user_id}|{key}", "user_id": user_id, "name": delta["name"], "mentions": delta["mentions"],
+         "total_amount": delta["total_amount"], "total_percentage": delta["total_percentage"]}
+        for (user_id, key), delta in user_deltas.items()
+    ]
+    await _replace_rollups(rollups, global_docs, rollups_before, batch_size)
+    await _replace_rollups(user_rollups, user_docs, user_rollups_before, batch_size)
+    return {"investments": len(global_docs), "user_investments": len(user_docs)}
+
+def _rollup_stats(doc: Dict[str, Any]) -> Dict[str, Any]:
+    mentions = doc["mentions"]
+    return {
+        "name": doc["name"],
+        "total_mentions": mentions,
+        "total_amount": round(doc["total_amount"], 2),
+        "avg_amount": round(doc["total_amount"] / mentions, 2),
+        "avg_percentage": round(doc["total_percentage"] / mentions, 2)
+    }
+
 async def get_user_investment_summary(user_id: str) -> Dict[str, Any]:
     """Get investment summary for a user."""
-    collection = await Database.get_collection("investment_plans")
+    rollups = await Database.get_analytics_collection("user_investment_rollups")
+    plans = await Database.get_analytics_collection("investment_plans")
     
     try:
-        pipeline = [
-            {"$match": {"user_id": user_id}},
-            {"$unwind": "$investments"},
-            {"$group": {
-                "_id": "$investments.type",
-                "total_amount": {"$sum": "$investments.amount"},
-                "count": {"$sum": 1},
-                "avg_percentage": {"$avg": "$investments.percentage"}
-            }},
-            {"$sort": {"total_amount": -1}}
-        ]
-        
-        cursor = collection.aggregate(pipeline)
-        summary = []
-        
-        async for doc in cursor:
-            summary.append({
-                "type": doc["_id"],
-                "total_amount": doc["total_amount"],
-                "count": doc["count"],
-                "avg_percentage": round(doc["avg_percentage"], 2)
-            })
+        cursor = rollups.find({"user_id": user_id, "mentions": {"$gt": 0}}).sort("total_amount", -1)
+        summary = [_rollup_stats(doc) async for doc in cursor]
         
         return {
             "user_id": user_id,
             "investment_summary": summary,
-            "total_plans": await collection.count_documents({"user_id": user_id})
+            "total_plans": await plans.count_documents({"user_id": user_id})
         }
     except:
         return {
@@ -176,33 +899,11 @@ async def get_user_investment_summary(user_id: str) -> Dict[str, Any]:
         }
 
 async def get_popular_investments(limit: int = 10) -> List[Dict[str, Any]]:
-    """Get most popular investment types across all users."""
-    collection = await Database.get_collection("investment_plans")
+    """Get the most recommended investments across all users."""
+    rollups = await Database.get_analytics_collection("investment_rollups")
     
     try:
-        pipeline = [
-            {"$unwind": "$investments"},
-            {"$group": {
-                "_id": "$investments.type",
-                "total_mentions": {"$sum": 1},
-                "avg_amount": {"$avg": "$investments.amount"},
-                "avg_percentage": {"$avg": "$investments.percentage"}
-            }},
-            {"$sort": {"total_mentions": -1}},
-            {"$limit": limit}
-        ]
-        
-        cursor = collection.aggregate(pipeline)
-        popular = []
-        
-        async for doc in cursor:
-            popular.append({
-                "type": doc["_id"],
-                "total_mentions": doc["total_mentions"],
-                "avg_amount": round(doc["avg_amount"], 2),
-                "avg_percentage": round(doc["avg_percentage"], 2)
-            })
-        
-        return popular
+        cursor = rollups.find({"mentions": {"$gt": 0}}).sort("mentions", -1).limit(limit)
+        return [_rollup_stats(doc) async for doc in cursor]
     except:
         return []
@@ -1,18 +1,55 @@
-import json
+import asyncio
+import logging
 import operator
+import os
+from functools import lru_cache
 from typing import Annotated, TypedDict
-from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Send
 from pydantic import BaseModel
-from agents.explainer.agent import ExplainingAgent
-from agents.planner.agent import AgentResponse, InvestmentAmount, InvestmentPlannerAgent
-from IPython.display import Image, display
+from agents.explainer.agent import BatchExplainingAgent, ExplainingAgent
+from agents.planner.agent import InvestmentAmount, InvestmentPlannerAgent, parse_planner_output
+from scheduler import explainer_scheduler
+from cache import ExplanationCache, normalize_text
+from plan_cache import plan_cache
+from portfolio import normalize_portfolio
+from checkpointing import agent_config, create_checkpointer
+from llm import model_registry
+from news import news_digests
+from telemetry import record_usage, span
 
-model = init_chat_model("gpt-5-mini", model_provider="openai")        
+logger = logging.getLogger("open_invest.graph")
 
-planning_agent = InvestmentPlannerAgent(model).build()
-explanation_agent = ExplainingAgent(model).build()
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    """Checkpointer shared by the agents, per the AGENT_CHECKPOINTER policy."""
+    return create_checkpointer()
+
+@lru_cache(maxsize=None)
+def get_planning_agent():
+    return InvestmentPlannerAgent(model_registry.get("planner")).build()
+
+@lru_cache(maxsize=None)
+def get_explanation_agent() -> CompiledStateGraph:
+    return ExplainingAgent(model_registry.get("explainer")).build(checkpointer=get_checkpointer())
+
+@lru_cache(maxsize=None)
+def get_batch_explanation_agent():
+    return BatchExplainingAgent(model_registry.get("explainer")).build()
+
+# Keyed on the explainer model, so switching it invalidates old explanations
+explanation_cache = ExplanationCache.from_env(model_registry.spec("explainer")["model"])
+
+# How planner responses were parsed (see parse_planner_output)
+planner_output_stats = {"structured": 0, "repaired": 0, "partial": 0}
+
+# Nodes whose output is a batch of explained investments
+EXPLAIN_NODES = ("explain_investment", "explain_batch")
+
+def explainer_mode() -> str:
+    """`fanout` (one explainer call per investment) or `batch` (one call per plan)."""
+    return os.getenv("EXPLAINER_MODE", "fanout").lower()
 
 mocked_context = {
     "country": "Argentina",
@@ -26,66 +63,201 @@ class InvestmentGraphState(TypedDict):
     investments: Annotated[list, operator.add]
     explained_investments: Annotated[list, operator.add]
     user_context: any
+    likes: list
+    run_id: str
+    bypass_plan_cache: bool
+    portfolio: dict
+
+def repair_investments(state: InvestmentGraphState, investments: list) -> None:
+    """Validate and repair the planned investments (see portfolio.normalize_portfolio).
+
+    Amounts are reconciled with their own sum: the planner read the message,
+    so its total is the one to keep. A caller with an explicit total (e.g. a
+    PATCH with `amount`) rescales the result itself.
+    """
+    with span("portfolio"):
+        repaired, portfolio = normalize_portfolio(investments)
+    if any(portfolio["repairs"].values()):
+        logger.info("Repaired planner output: %s", portfolio["repairs"])
+    state["investments"] = [InvestmentAmount(**item) for item in repaired]
+    state["portfolio"] = portfolio
+
+async def get_investment_ideas(state: InvestmentGraphState) -> InvestmentGraphState:
+    use_plan_cache = not state.get("bypass_plan_cache", False)
+    if use_plan_cache:
+        cached_investments = plan_cache.lookup(state['user_context'], state['user_message'])
+        if cached_investments is not None:
+            repair_investments(state, cached_investments)
+            return state
 
-def get_investment_ideas(state: InvestmentGraphState) -> InvestmentGraphState:
-    agent = planning_agent
+    agent = get_planning_agent()
     
     prompt = f"Message: {state['user_message']}. User Context: {state['user_context']}"
+    # Prefetched on a schedule, this never waits on a search
+    news = await news_digests.context(state['user_context'].get('country', ''))
+    if news:
+        prompt += f"\nRecent financial news:\n{news}"
 
-    investment_plan = agent.invoke({"messages": [prompt]})
-    content = investment_plan["messages"][-1].content
-
-    json_data = json.loads(content)
-    parsed_response = AgentResponse(**json_data)
-    state["investments"] = parsed_response.investments
+    with span("planner"):
+        output = await agent.ainvoke({"input": prompt})
+    record_usage("planner", output.get("raw"))
+    parsed_response, outcome = parse_planner_output(output)
+    planner_output_stats[outcome] += 1
+    if outcome != "structured":
+        logger.warning("Planner output needed a %s parse: %s", outcome, output.get("parsing_error"))
+    repair_investments(state, [investment.model_dump() for investment in parsed_response.investments])
+    if use_plan_cache and outcome != "partial":
+        plan_cache.store(state['user_context'], state['user_message'], state["investments"])
     return state
 
 def continue_to_explanation(state: InvestmentGraphState):
-    print('Sending investments to branches!')
-    return [Send("explain_investment", {"investment": i}) for i in state["investments"]]
+    logger.debug("Sending %d investments to the explainer", len(state["investments"]))
+    run_id = state.get("run_id", "default")
+    likes = state.get("likes") or []
+    if explainer_mode() == "batch":
+        return [Send("explain_batch", {"investments": state["investments"], "likes": likes, "run_id": run_id})]
+    return [
+        Send("explain_investment", {"investment": i, "likes": likes, "run_id": run_id})
+        for i in state["investments"]
+    ]
 
-# Create a new Graph
-workflow = StateGraph(state_schema=InvestmentGraphState)
+async def explain_investment(investment: InvestmentAmount):
+    user_likes = ", ".join(investment.get("likes") or ['futbol'])
+    cache_key = explanation_cache.key(investment['investment'].name, user_likes)
+    explanation = await explanation_cache.get(cache_key)
+    if explanation is not None:
+        investment['investment'].explanation = explanation
+        return {"explained_investments": [investment]}
 
-def explain_investment(investment: InvestmentAmount):
-    user_likes = 'futbol'
-    print('Starting to explain')
-    message = f"Investment: {investment}. User Fav: {user_likes}"
-    agent = explanation_agent
-    agent_response = agent.invoke({"messages": [message]})
+    message = f"Investment: {investment['investment']}. User Fav: {user_likes}"
+    agent = get_explanation_agent()
+    async with explainer_scheduler.slot(investment.get("run_id", "default")):
+        with span("explainer"):
+            agent_response = await agent.ainvoke(
+                {"messages": [message]},
+                agent_config(investment.get("run_id", ""), "explainer", investment['investment'].name)
+            )
 
+    record_usage("explainer", agent_response["messages"][-1])
     explanation = agent_response["messages"][-1].content
+    await explanation_cache.set(cache_key, explanation)
 
-    print('Explained!')
+    logger.debug("Explained %s", investment['investment'].name)
     investment['investment'].explanation = explanation
     return {"explained_investments": [investment]}
 
-# Add the nodes
-workflow.add_node("investment_plan", get_investment_ideas)
-workflow.add_node("explain_investment", explain_investment)
+async def explain_batch(batch: dict):
+    """Explain all of a plan's investments with one structured-output call.
+
+    Cached explanations are reused, and any investment the batch response
+    leaves out (or explains with an empty string) falls back to the
+    per-investment explainer.
+    """
+    run_id = batch.get("run_id", "default")
+    likes = batch.get("likes") or []
+    user_likes = ", ".join(likes or ['futbol'])
+
+    explained = []
+    pending = []
+    for investment in batch["investments"]:
+        cache_key = explanation_cache.key(investment.name, user_likes)
+        explanation = await explanation_cache.get(cache_key)
+        if explanation is not None:
+            investment.explanation = explanation
+            explained.append({"investment": investment, "likes": likes, "run_id": run_id})
+        else:
+            pending.append((investment, cache_key))
+
+    fallback = []
+    if pending:
+        message = "\n".join(
+            f"- Investment: {investment}" for investment, _ in pending
+        ) + f"\nUser Fav: {user_likes}"
+        try:
+            async with explainer_scheduler.slot(run_id):
+                with span("explain_batch"):
+                    output = await get_batch_explanation_agent().ainvoke({"input": message})
+            record_usage("explainer", output["raw"])
+            response = output["parsed"]
+            if response is None:
+                raise ValueError(f"unparseable batch response: {output.get('parsing_error')}")
+            by_name = {
+                normalize_text(item.name): item.explanation
+                for item in response.explanations
+                if item.explanation and item.explanation.strip()
+            }
+        except Exception as e:
+            logger.warning("Batch explanation failed, falling back to one call per investment: %s", e)
+            by_name = {}
+
+        for investment, cache_key in pending:
+            explanation = by_name.get(normalize_text(investment.name))
+            if explanation is None:
+                fallback.append({"investment": investment, "likes": likes, "run_id": run_id})
+                continue
+            await explanation_cache.set(cache_key, explanation)
+            investment.explanation = explanation
+            explained.append({"investment": investment, "likes": likes, "run_id": run_id})
+
+    if fallback:
+        logger.info("Falling back to single explanations for %d investments", len(fallback))
+        results = await asyncio.gather(*[explain_investment(item) for item in fallback])
+        for result in results:
+            explained.extend(result["explained_investments"])
+
+    return {"explained_investments": explained}
+
+async def explain_investments(investments: list, likes: list, run_id: str) -> list:
+    """Explain investments outside the workflow, e.g. when only a plan's likes changed.
+
+    Takes and returns the investments as dicts, in the same order, with
+    their explanations replaced. Goes through the same explainer mode,
+    cache and scheduler as the workflow.
+    """
+    items = [InvestmentAmount(**{**investment, "explanation": None}) for investment in investments]
+    if explainer_mode() == "batch":
+        await explain_batch({"investments": items, "likes": likes, "run_id": run_id})
+    else:
+        await asyncio.gather(*[
+            explain_investment({"investment": item, "likes": likes, "run_id": run_id})
+            for item in items
+        ])
+    # Both paths fill in the explanation of each item in place
+    return [{**investment, "explanation": item.explanation} for investment, item in zip(investments, items)]
+
+def build_workflow() -> StateGraph:
+    """Build the (uncompiled) investment workflow."""
+    # Create a new Graph
+    workflow = StateGraph(state_schema=InvestmentGraphState)
 
-# Add the Edges
-# workflow.add_edge("investment_plan", "node_2")
-workflow.add_conditional_edges("investment_plan", continue_to_explanation, ["explain_investment"])
-workflow.set_entry_point("investment_plan")
-workflow.set_finish_point("explain_investment")
+    # Add the nodes
+    workflow.add_node("investment_plan", get_investment_ideas)
+    workflow.add_node("explain_investment", explain_investment)
+    workflow.add_node("explain_batch", explain_batch)
 
-#Run the workflow
-app = workflow.compile()
+    # Add the Edges
+    workflow.add_conditional_edges("investment_plan", continue_to_explanation, list(EXPLAIN_NODES))
+    workflow.set_entry_point("investment_plan")
+    workflow.set_finish_point("explain_investment")
+    workflow.set_finish_point("explain_batch")
+    return workflow
 
-# state = InvestmentGraphState(
-#     investmentPlan="",
-#     user_message='Tengo 6000 dolares para invertir',
-#     investments=[]
-#     user_context=user_context
-# )
+@lru_cache(maxsize=None)
+def get_graph() -> CompiledStateGraph:
+    """Compiled investment workflow, built on first use.
 
-# result = app.invoke(state)
+    Agents and the chat model are only created when a node first runs, so
+    compiling the graph (e.g. to render it) doesn't need API credentials.
+    """
+    return build_workflow().compile()
 
-# Save the Mermaid graph as a PNG file instead of trying to display it
-graph_image = app.get_graph().draw_mermaid_png()
-with open("investment_workflow.png", "wb") as f:
-    f.write(graph_image)
-print("Graph saved as 'investment_workflow.png'")
+def render_graph(output_path: str = "investment_workflow.png") -> str:
+    """Render the workflow as a Mermaid PNG.
 
-graph = app
\ No newline at end of file
+    The default renderer calls the mermaid.ink web service, so this needs
+    network access; it is meant to be run from the CLI, not at startup.
+    """
+    graph_image = get_graph().get_graph().draw_mermaid_png()
+    with open(output_path, "wb") as f:
+        f.write(graph_image)
+    return output_path
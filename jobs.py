@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telemetry import record_queue_wait
+
+JobFactory = Callable[[], Awaitable[Any]]
+
+logger = logging.getLogger("open_invest.jobs")
+
+class JobBackend(ABC):
+    """Interface for running plan jobs in the background"""
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Start accepting and running jobs"""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Stop the workers"""
+        pass
+
+    @abstractmethod
+    async def submit(self, job_id: str, job: JobFactory) -> None:
+        """Queue a job to be run by a worker"""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class LocalJobBackend(JobBackend):
+    """In-process worker pool backed by an asyncio queue.
+
+    Jobs only live in this process, so anything still queued when the
+    process stops is lost and stays in its last persisted status.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 1000) -> None:
+        self.workers = workers
+        self.queue: Optional[asyncio.Queue] = None
+        self.queue_size = queue_size
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("Started %d local plan job workers", self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job_id: str, job: JobFactory) -> None:
+        if self.queue is None:
+            raise RuntimeError("Job backend has not been started")
+        self.queue.put_nowait((job_id, job, time.perf_counter()))
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job_id, job, queued_at = await self.queue.get()
+            record_queue_wait("plan_jobs", time.perf_counter() - queued_at)
+            try:
+                await job()
+                self.completed += 1
+            except Exception as e:
+                # Jobs record their own failure status, this only keeps the worker alive
+                self.failed += 1
+                logger.warning("Plan job %s failed on worker %d: %s", job_id, worker_id, e)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+def create_job_backend() -> JobBackend:
+    """Build the job backend configured by PLAN_JOB_BACKEND."""
+    backend = os.getenv("PLAN_JOB_BACKEND", "local")
+    if backend == "local":
+        return LocalJobBackend(
+            workers=int(os.getenv("PLAN_JOB_WORKERS", "4")),
+            queue_size=int(os.getenv("PLAN_JOB_QUEUE_SIZE", "1000")),
+        )
+    raise ValueError(f"Unknown plan job backend: {backend}")
+
+job_backend = create_job_backend()
@@ -0,0 +1,605 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import math
+import os
+import random
+import statistics
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+ROLES = ("planner", "explainer", "news")
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Absolute time.monotonic() deadline for the LLM calls of the current request
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound every LLM call made inside the block, retries included, by `seconds` from now.
+
+    Nested deadlines can only shorten the outer one. Tasks started inside
+    the block (graph nodes included) inherit it.
+    """
+    if not seconds:
+        yield
+        return
+    current = _deadline.get()
+    new_deadline = time.monotonic() + seconds
+    token = _deadline.set(new_deadline if current is None else min(current, new_deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def _role_setting(role: str, name: str, default: str) -> str:
+    """LLM_<ROLE>_<NAME>, falling back to LLM_<NAME> and then `default`."""
+    return os.getenv(f"LLM_{role.upper()}_{name}") or os.getenv(f"LLM_{name}") or default
+
+class CallPolicy:
+    """Timeout, retry and hedging policy of one role, with its call stats."""
+
+    def __init__(
+        self,
+        timeout_seconds: float = 60,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.5,
+        hedge: bool = False,
+        hedge_delay_seconds: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_seconds = backoff_seconds
+        self.hedge = hedge
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies: deque = deque(maxlen=500)
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+
+    @classmethod
+    def from_env(cls, role: str) -> "CallPolicy":
+        hedge_delay = _role_setting(role, "HEDGE_DELAY_SECONDS", "")
+        return cls(
+            timeout_seconds=float(_role_setting(role, "TIMEOUT_SECONDS", "60")),
+            max_attempts=int(_role_setting(role, "MAX_ATTEMPTS", "3")),
+            backoff_seconds=float(_role_setting(role, "BACKOFF_SECONDS", "0.5")),
+            hedge=_role_setting(role, "HEDGE", "false").lower() == "true",
+            hedge_delay_seconds=float(hedge_delay) if hedge_delay else None,
+        )
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 2:
+            return None
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(q) - 1]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged request: the fixed one, or the observed p95."""
+        if not self.hedge:
+            return None
+        if self.hedge_delay_seconds is not None:
+            return self.hedge_delay_seconds
+        if len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.percentile(95)
+
+    def backoff(self, retry: int, response: Optional[httpx.Response]) -> float:
+        """Exponential backoff with full jitter, or the server's Retry-After."""
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_seconds * 2 ** retry, 8.0))
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(q) for q in (50, 95, 99))
+        return {
+            "timeout_seconds": self.timeout_seconds,
+            "max_attempts": self.max_attempts,
+            "hedge": self.hedge,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "latency_seconds": {
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "p99": round(p99, 3) if p99 is not None else None,
+            },
+        }
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """Adds deadline-aware retries and hedged requests on top of a shared pool.
+
+    Every attempt is bounded by the remaining time until the earliest of the
+    role timeout and the request deadline (see `deadline`), and no retry is
+    started that couldn't finish before it. With hedging on, a second copy
+    of a slow request is sent after the hedge delay and the first good
+    response wins; the other one is cancelled.
+    """
+
+    def __init__(self, pool: httpx.AsyncBaseTransport, policy: CallPolicy) -> None:
+        self.pool = pool
+        self.policy = policy
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy.calls += 1
+        # Read the body up front so it can be sent more than once
+        await request.aread()
+        call_deadline = time.monotonic() + policy.timeout_seconds
+        request_deadline = _deadline.get()
+        if request_deadline is not None:
+            call_deadline = min(call_deadline, request_deadline)
+
+        retry = 0
+        while True:
+            response: Optional[httpx.Response] = None
+            error: Optional[Exception] = None
+            try:
+                response = await self._send_hedged(request, call_deadline)
+            except httpx.TransportError as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            retry += 1
+            wait = policy.backoff(retry - 1, response)
+            if retry >= policy.max_attempts or time.monotonic() + wait >= call_deadline:
+                policy.failures += 1
+                if time.monotonic() + wait >= call_deadline:
+                    policy.deadline_exceeded += 1
+                if response is not None:
+                    return response
+                raise error
+            if response is not None:
+                await response.aclose()
+            policy.retries += 1
+            await asyncio.sleep(wait)
+
+    async def _send_once(self, request: httpx.Request, call_deadline: float) -> httpx.Response:
+        remaining = call_deadline - time.monotonic()
+        if remaining <= 0:
+            raise httpx.TimeoutException("LLM call deadline exceeded", request=request)
+        request.extensions = {
+            **request.extensions,
+            "timeout": {"connect": min(remaining, 10.0), "read": remaining, "write": remaining, "pool": remaining},
+        }
+        self.policy.attempts += 1
+        started = time.monotonic()
+        try:
+            # The pool enforces the timeouts above too, this also covers slow pool waits
+            response = await asyncio.wait_for(self.pool.handle_async_request(request), remaining)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout("LLM call deadline exceeded", request=request)
+        if response.status_code < 500:
+            self.policy.latencies.append(time.monotonic() - started)
+        return response
+
+    async def _send_hedged(self, request: httpx.Request, call_deadline: float) -> httpx.Response:
+        primary = asyncio.ensure_future(self._send_once(request, call_deadline))
+        delay = self.policy.hedge_delay()
+        if delay is None or time.monotonic() + delay >= call_deadline:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.policy.hedges += 1
+        hedged = asyncio.ensure_future(self._send_once(request, call_deadline))
+        pending = {primary, hedged}
+        winner: Optional[asyncio.Future] = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS_CODES:
+                        winner = task
+                        break
+            if winner is None:
+                # Both failed, report the original request's outcome
+                winner = primary
+            elif winner is hedged:
+                self.policy.hedge_wins += 1
+            return winner.result()
+        finally:
+            losers = [task for task in (primary, hedged) if task is not winner]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+            for task in losers:
+                if not task.cancelled() and task.exception() is None:
+                    await task.result().aclose()
+
+    async def aclose(self) -> None:
+        # The pool is shared between roles and closed by the registry
+        pass
+
+FAKE_PLAN = {
+    "investments": [
+        {"name": "Plazo fijo", "amount": 5000, "percentage": 50, "reason": "Low risk fixed income", "risk": 2, "ease_of_use": 1},
+        {"name": "CEDEARs", "amount": 3000, "percentage": 30, "reason": "Exposure to global companies", "risk": 6, "ease_of_use": 4},
+        {"name": "Bonos", "amount": 2000, "percentage": 20, "reason": "Steady income from bonds", "risk": 4, "ease_of_use": 5},
+    ]
+}
+# Canned structured responses by schema name, others are generated from the schema
+FAKE_STRUCTURED = {"AgentResponse": FAKE_PLAN}
+FAKE_TEXT = {
+    "planner": json.dumps(FAKE_PLAN),
+    "explainer": "Think of this investment like a solid defense: it keeps your savings safe while you wait for chances to score.",
+    "news": "No news today (fake model).",
+}
+
+def _fake_value(schema: Dict[str, Any], defs: Dict[str, Any], name: str, index: int) -> Any:
+    """A valid value for a JSON schema, deterministic for the same inputs."""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, name, index)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+            return _fake_value(options[0], defs, name, index)
+    if "default" in schema:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {key: _fake_value(value, defs, key, index) for key, value in properties.items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), defs, name, i) for i in range(3)]
+    if kind in ("integer", "number"):
+        low, high = schema.get("minimum", 1), schema.get("maximum", 10)
+        return min(max(index + 1, low), high)
+    if kind == "boolean":
+        return False
+    return f"Fake {name} {index + 1}"
+
+class FakeChatModel(BaseChatModel):
+    """Local chat model for tests and offline runs, never calls a provider.
+
+    Plain calls answer with a canned text for the role (a valid plan for the
+    planner); calls that force a tool, as with_structured_output does, get a
+    tool call with arguments generated from the tool's JSON schema.
+    """
+
+    role: str = "planner"
+    latency_seconds: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return self._respond(kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._respond(kwargs)
+
+    def _respond(self, kwargs: Dict[str, Any]) -> ChatResult:
+        self.calls += 1
+        tools: List[Dict[str, Any]] = kwargs.get("tools") or []
+        if tools and kwargs.get("tool_choice"):
+            function = tools[0]["function"]
+            parameters = function.get("parameters", {})
+            arguments = FAKE_STRUCTURED.get(function["name"]) or _fake_value(parameters, parameters.get("$defs", {}), function["name"], 0)
+            message = AIMessage(content="", tool_calls=[{"name": function["name"], "args": arguments, "id": f"fake-{self.calls}"}])
+        else:
+            message = AIMessage(content=FAKE_TEXT.get(self.role, FAKE_TEXT["explainer"]))
+        message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def fixture_key(role: str, messages: List[Any], tools: Optional[List[Any]] = None, response_format: Any = None) -> str:
+    """Stable key of a chat call: the role, the prompt messages and the tool names.
+
+    A schema `response_format` (a class, or a json_schema response format)
+    counts as a tool of the schema's name, so a structured call recorded
+    through a provider's JSON schema mode has the same key as the tool call
+    ReplayChatModel gets for it.
+    """
+    names = [convert_to_openai_tool(tool)["function"]["name"] for tool in tools or []]
+    if isinstance(response_format, dict) and "json_schema" in response_format:
+        names.append(response_format["json_schema"]["name"])
+    elif response_format is not None and not isinstance(response_format, dict):
+        names.append(convert_to_openai_tool(response_format)["function"]["name"])
+    prompt = [[message.type, message.content] for message in messages]
+    raw = json.dumps([role, prompt, sorted(names)], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class RecordingChatModel(BaseChatModel):
+    """Wraps a real chat model and appends every response to `<directory>/<role>.jsonl`.
+
+    Calls reach the wrapped model with all their arguments, and bind_tools
+    and with_structured_output are the wrapped model's own, so provider
+    options (strict, parallel_tool_calls, a JSON schema response_format)
+    are sent as in production. Each line holds the call's fixture_key, the
+    response message and how long it took, for ReplayChatModel to play back.
+    """
+
+    model: BaseChatModel
+    role: str = "planner"
+    directory: str = "benchmarks/fixtures"
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        # The wrapped model formats the tools and its options, the calls still come through here
+        return self.bind(**self.model.bind_tools(tools, tool_choice=tool_choice, **kwargs).kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        # The wrapped model's implementation calls the wrapped model directly, so its calls are recorded by a callback
+        return self.model.with_structured_output(schema, **kwargs).with_config(callbacks=[_FixtureRecorder(self)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        started = time.monotonic()
+        message = self.model.invoke(messages, stop=stop, **kwargs)
+        self.record(self.key(messages, kwargs), message, time.monotonic() - started)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        started = time.monotonic()
+        message = await self.model.ainvoke(messages, stop=stop, **kwargs)
+        self.record(self.key(messages, kwargs), message, time.monotonic() - started)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def key(self, messages: List[Any], params: Dict[str, Any]) -> str:
+        return fixture_key(self.role, messages, params.get("tools"), params.get("response_format"))
+
+    def record(self, key: str, message: AIMessage, latency_seconds: float) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"key": key, "latency_seconds": round(latency_seconds, 4), "message": message_to_dict(message)}
+        with open(os.path.join(self.directory, f"{self.role}.jsonl"), "a", encoding="utf-8") as fixture:
+            fixture.write(json.dumps(entry, default=str) + "\n")
+
+class _FixtureRecorder(BaseCallbackHandler):
+    """Records the chat calls of a runnable the wrapped model built (see RecordingChatModel.with_structured_output)."""
+
+    run_inline = True
+
+    def __init__(self, recorder: RecordingChatModel) -> None:
+        self.recorder = recorder
+        self.calls: Dict[Any, Any] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self.calls[run_id] = (self.recorder.key(messages[0], kwargs.get("invocation_params") or {}), time.monotonic())
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        call = self.calls.pop(run_id, None)
+        if call is not None:
+            key, started = call
+            self.recorder.record(key, response.generations[0][0].message, time.monotonic() - started)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self.calls.pop(run_id, None)
+
+class ReplayChatModel(BaseChatModel):
+    """Plays back responses recorded by RecordingChatModel, never calls a provider.
+
+    Calls are matched by fixture_key; a call that wasn't recorded gets the
+    role's recordings in turn (structured answers for structured output,
+    text otherwise), so runs are deterministic for the same sequence of
+    calls. A structured answer recorded as JSON content (a provider's JSON
+    schema mode) is replayed as the tool call with_structured_output here
+    expects.
+    Latency is simulated per `latency`:
+
+    - recorded: each response's own recorded latency (default)
+    - sampled: drawn from the role's recorded latencies with a seeded RNG
+    - lognormal: drawn from a lognormal with the given median and p95
+    - none: answer right away
+
+    and multiplied by `latency_scale`.
+    """
+
+    role: str = "planner"
+    directory: str = "benchmarks/fixtures"
+    latency: str = "recorded"
+    latency_scale: float = 1.0
+    median_seconds: float = 1.0
+    p95_seconds: float = 3.0
+    seed: int = 0
+    calls: int = 0
+    _entries: List[Dict[str, Any]] = []
+    _by_key: Dict[str, deque] = {}
+    _rng: Any = None
+
+    def model_post_init(self, context: Any) -> None:
+        path = os.path.join(self.directory, f"{self.role}.jsonl")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No recorded {self.role} responses at {path}, record some with LLM_RECORD_DIR")
+        with open(path, encoding="utf-8") as fixture:
+            self._entries = [json.loads(line) for line in fixture if line.strip()]
+        self._by_key = {}
+        for entry in self._entries:
+            self._by_key.setdefault(entry["key"], deque()).append(entry)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=list(tools), tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self._next_entry(messages, kwargs.get("tools"))
+        time.sleep(self._latency(entry))
+        return self._result(entry, kwargs.get("tools"))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self._next_entry(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._latency(entry))
+        return self._result(entry, kwargs.get("tools"))
+
+    def _next_entry(self, messages, tools) -> Dict[str, Any]:
+        self.calls += 1
+        recorded = self._by_key.get(fixture_key(self.role, messages, tools))
+        if not recorded:
+            wants_tool = bool(tools)
+            candidates = [entry for entry in self._entries if _is_structured(entry) == wants_tool]
+            if not candidates:
+                raise LookupError(f"No recorded {self.role} response {'with' if wants_tool else 'without'} a tool call")
+            return candidates[(self.calls - 1) % len(candidates)]
+        # Repeated calls cycle through the responses recorded for the same prompt
+        recorded.rotate(-1)
+        return recorded[-1]
+
+    def _latency(self, entry: Dict[str, Any]) -> float:
+        if self.latency == "none":
+            return 0.0
+        if self.latency == "sampled":
+            seconds = self._rng.choice(self._entries)["latency_seconds"]
+        elif self.latency == "lognormal":
+            # p95 of a lognormal is median * exp(1.645 sigma)
+            sigma = max(math.log(self.p95_seconds / self.median_seconds) / 1.645, 0.0)
+            seconds = self._rng.lognormvariate(math.log(self.median_seconds), sigma)
+        else:
+            seconds = entry["latency_seconds"]
+        return seconds * self.latency_scale
+
+    def _result(self, entry: Dict[str, Any], tools: Optional[List[Any]] = None) -> ChatResult:
+        message = messages_from_dict([entry["message"]])[0]
+        if tools and not message.tool_calls and _is_structured(entry):
+            name = convert_to_openai_tool(tools[0])["function"]["name"]
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": name, "args": json.loads(message.content), "id": f"replay-{self.calls}"}],
+                usage_metadata=message.usage_metadata,
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def _is_structured(entry: Dict[str, Any]) -> bool:
+    """Whether a recorded response answers structured output: a tool call, or a JSON object."""
+    data = entry["message"]["data"]
+    if data.get("tool_calls"):
+        return True
+    try:
+        return isinstance(json.loads(data.get("content") or ""), dict)
+    except ValueError:
+        return False
+
+class ModelRegistry:
+    """Chat models per agent role, configured from the environment.
+
+    Each role (planner, explainer, news) reads LLM_<ROLE>_PROVIDER and
+    LLM_<ROLE>_MODEL, falling back to LLM_PROVIDER / LLM_MODEL, so e.g. the
+    explainer can run on a cheaper model than the planner. Provider `fake`
+    is FakeChatModel and provider `replay` is ReplayChatModel; setting
+    LLM_RECORD_DIR records every real response for replay. OpenAI models share one pooled HTTP transport, wrapped
+    per role with that role's timeout, retry and hedging policy; the SDK's
+    own retries are turned off so the policy is the only one.
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[str, BaseChatModel] = {}
+        self._policies: Dict[str, CallPolicy] = {}
+        self._pool: Optional[httpx.AsyncHTTPTransport] = None
+
+    def spec(self, role: str) -> Dict[str, str]:
+        return {
+            "provider": _role_setting(role, "PROVIDER", "openai").lower(),
+            "model": _role_setting(role, "MODEL", "gpt-5-mini"),
+        }
+
+    def policy(self, role: str) -> CallPolicy:
+        if role not in self._policies:
+            self._policies[role] = CallPolicy.from_env(role)
+        return self._policies[role]
+
+    def pool(self) -> httpx.AsyncHTTPTransport:
+        """Connection pool shared by every role's HTTP client."""
+        if self._pool is None:
+            self._pool = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30")),
+            ))
+        return self._pool
+
+    def http_client(self, role: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=ResilientTransport(self.pool(), self.policy(role)),
+            timeout=httpx.Timeout(self.policy(role).timeout_seconds),
+        )
+
+    def get(self, role: str) -> BaseChatModel:
+        """The chat model of a role, built on first use."""
+        if role in self._models:
+            return self._models[role]
+        spec = self.spec(role)
+        if spec["provider"] == "fake":
+            model = FakeChatModel(role=role, latency_seconds=float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0")))
+        elif spec["provider"] == "replay":
+            model = ReplayChatModel(
+                role=role,
+                directory=os.getenv("LLM_REPLAY_DIR", "benchmarks/fixtures"),
+                latency=_role_setting(role, "REPLAY_LATENCY", "recorded").lower(),
+                latency_scale=float(_role_setting(role, "REPLAY_LATENCY_SCALE", "1")),
+                median_seconds=float(_role_setting(role, "REPLAY_MEDIAN_SECONDS", "1")),
+                p95_seconds=float(_role_setting(role, "REPLAY_P95_SECONDS", "3")),
+                seed=int(os.getenv("LLM_REPLAY_SEED", "0")),
+            )
+        else:
+            from langchain.chat_models import init_chat_model
+
+            kwargs: Dict[str, Any] = {}
+            if spec["provider"] in ("openai", "azure_openai"):
+                kwargs = {"http_async_client": self.http_client(role), "max_retries": 0}
+            model = init_chat_model(spec["model"], model_provider=spec["provider"], **kwargs)
+            if os.getenv("LLM_RECORD_DIR"):
+                model = RecordingChatModel(model=model, role=role, directory=os.getenv("LLM_RECORD_DIR"))
+        self._models[role] = model
+        return model
+
+    def override(self, role: str, model: BaseChatModel) -> None:
+        """Use `model` for a role instead of the configured one, e.g. a stub in a benchmark."""
+        self._models[role] = model
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.aclose()
+            self._pool = None
+        self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            role: {**self.spec(role), **self.policy(role).stats()}
+            for role in ROLES
+        }
+
+model_registry = ModelRegistry()
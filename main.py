@@ -1,30 +1,55 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from email import message
 from typing import Any
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from graph import InvestmentGraphState, graph
+from graph import EXPLAIN_NODES, InvestmentGraphState, explain_investments, explanation_cache, get_checkpointer, get_graph, planner_output_stats
 from pydantic import BaseModel
-from models import PlanInput, PlanResponse, UserCreate, User, DatabaseResponse, InvestmentPlanCreate, InvestmentAmount
-from database import Database, create_investment_plan, get_investment_plan_by_id, get_investment_plans_by_user, create_user, get_user_by_email
+from models import PlanInput, PlanResponse, PlanRevision, PlanRevisionResponse, PlanJobResponse, InvestmentPlanSummaryPage, InvestmentExplanation, UserCreate, User, DatabaseResponse, InvestmentPlanCreate, InvestmentAmount
+from database import Database, create_investment_plan, create_investment_plans_bulk, get_investment_plan_document, get_investment_plan_explanations, get_investment_plan_by_id, get_investment_plan_by_idempotency_key, get_investment_plan_summaries, update_investment_plan, create_user, create_users_bulk, get_user_by_email, get_popular_investments, get_user_investment_summary, plan_read_cache, user_read_cache
+from scheduler import explainer_scheduler
+from plan_cache import find_amounts, message_idea, plan_cache, replace_amount, states_amount
+from portfolio import normalize_portfolio
+from jobs import job_backend
+from news import news_digests
+from singleflight import SingleFlight, request_key
+from llm import deadline as llm_deadline, model_registry
+from telemetry import TimingMiddleware, configure_logging, render_metrics, span
+from pymongo.errors import DuplicateKeyError
+from cache import normalize_text
 from datetime import datetime
+import asyncio
 import json
+import logging
+import os
+import tempfile
+import uuid
+
+configure_logging()
+logger = logging.getLogger("open_invest")
 
 # Database lifecycle
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await Database.connect_db()
+    await job_backend.start()
+    await news_digests.start()
     yield
     # Shutdown
+    await news_digests.stop()
+    await job_backend.stop()
+    await model_registry.aclose()
     await Database.close_db()
 
 app = FastAPI(
     title="Open-Invest API",
     description="AI-Powered Investment Planning Agent with MongoDB",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -36,10 +61,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class PlanInput(BaseModel):
-    user_context: Dict[str, Any]
-    message: str
-    likes: List[str]
+# Request timings for /metrics, and optionally a Server-Timing breakdown per response
+app.add_middleware(TimingMiddleware, server_timing=os.getenv("SERVER_TIMING_HEADER", "false").lower() == "true")
 
 def extract_investment_data(investment_dict):
     """Extract investment data from the nested structure returned by AI workflow"""
@@ -57,6 +80,8 @@ def extract_investment_data(investment_dict):
                 percentage = getattr(investment, 'percentage', 0)
                 reason = getattr(investment, 'reason', 'No reason provided')
                 explanation = getattr(investment, 'explanation', None)
+                risk = getattr(investment, 'risk', None)
+                ease_of_use = getattr(investment, 'ease_of_use', None)
             elif isinstance(investment, dict):
                 # It's a dictionary
                 name = investment.get('name', 'Unknown')
@@ -64,6 +89,8 @@ def extract_investment_data(investment_dict):
                 percentage = investment.get('percentage', 0)
                 reason = investment.get('reason', 'No reason provided')
                 explanation = investment.get('explanation', None)
+                risk = investment.get('risk')
+                ease_of_use = investment.get('ease_of_use')
             else:
                 # Fallback for unknown types
                 name = str(investment)
@@ -71,6 +98,7 @@ def extract_investment_data(investment_dict):
                 percentage = 0
                 reason = 'Data extraction failed'
                 explanation = None
+                risk = ease_of_use = None
             
             # Create a new dict with the flattened structure
             extracted = {
@@ -78,8 +106,9 @@ def extract_investment_data(investment_dict):
                 'amount': float(amount) if amount is not None else 0,
                 'percentage': float(percentage) if percentage is not None else 0,
                 'reason': reason,
-                'risk': int(investment_dict.get('risk', 5)),  # Default to 5 if not present
-                'ease_of_use': int(investment_dict.get('ease_of_use', 5)),  # Default to 5 if not present
+                # The scores live on the investment, the outer dict is only a fallback
+                'risk': int(risk if risk is not None else investment_dict.get('risk', 5)),
+                'ease_of_use': int(ease_of_use if ease_of_use is not None else investment_dict.get('ease_of_use', 5)),
                 'explanation': explanation
             }
             return extracted
@@ -107,8 +136,7 @@ def extract_investment_data(investment_dict):
                     'explanation': None
                 }
     except Exception as e:
-        print(f"❌ Error extracting investment data: {e}")
-        print(f"❌ Investment dict: {investment_dict}")
+        logger.error("Error extracting investment data from %s: %s", investment_dict, e)
         # Return a default structure to prevent crashes
         return {
             'name': 'Unknown Investment',
@@ -126,85 +154,567 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "Open-Invest API", "database": "connected"}
+    """Ping the database and report pool stats, 503 when it is unreachable."""
+    database = await Database.health()
+    healthy = database["status"] == "connected"
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={"status": "healthy" if healthy else "unhealthy", "service": "Open-Invest API", "database": database}
+    )
+
+@app.get("/metrics", response_class=Response)
+async def prometheus_metrics():
+    """Request, stage, queue wait, token and cache histograms in the Prometheus text format."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/explainer")
+async def explainer_metrics():
+    """Queue depth and wait times of the explainer scheduler."""
+    return explainer_scheduler.stats()
+
+@app.get("/metrics/explanation-cache")
+async def explanation_cache_metrics():
+    """Hit/miss counters of the explanation cache."""
+    return explanation_cache.stats()
+
+@app.get("/metrics/plan-cache")
+async def plan_cache_metrics():
+    """Hit/miss counters of the planner result cache."""
+    return plan_cache.stats()
+
+@app.get("/metrics/jobs")
+async def job_metrics():
+    """Queue and completion counters of the plan job backend."""
+    return job_backend.stats()
+
+@app.get("/metrics/plan-requests")
+async def plan_request_metrics():
+    """How many /plan requests shared an in-flight workflow run."""
+    return plan_flights.stats()
+
+@app.get("/metrics/read-cache")
+async def read_cache_metrics():
+    """Hit ratio of the plan and user read-through caches."""
+    return {"plans": plan_read_cache.stats(), "users": user_read_cache.stats()}
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Model, call policy and latency of each agent role, and how planner output was parsed."""
+    return {**model_registry.stats(), "planner_output": planner_output_stats}
+
+@app.get("/metrics/news")
+async def news_metrics():
+    """Refresh counters of the news digests."""
+    return news_digests.stats()
+
+@app.get("/metrics/checkpointer")
+async def checkpointer_metrics():
+    """Size and evictions of the agent checkpointer, when it's bounded."""
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return {"policy": "none"}
+    if hasattr(checkpointer, "stats"):
+        return checkpointer.stats()
+    return {"policy": type(checkpointer).__name__}
+
+# Identical in-flight /plan requests share one workflow run
+plan_flights = SingleFlight()
+
+# Upper bound on the LLM calls of one plan, retries and hedges included
+PLAN_DEADLINE_SECONDS = float(os.getenv("LLM_PLAN_DEADLINE_SECONDS", "300"))
+
+# For now, we'll use a mock user_id (in production, you'd get this from authentication)
+# You can modify this to use actual user authentication
+MOCK_USER_ID = "mock_user_123"  # Simple string ID
+
+def build_initial_state(body: PlanInput) -> InvestmentGraphState:
+    """Build the AI workflow input for a plan request."""
+    return InvestmentGraphState(
+        user_context=body.user_context,
+        explained_investments=[],
+        investments=[],
+        user_message=body.message,
+        likes=body.likes,
+        run_id=uuid.uuid4().hex,
+        bypass_plan_cache=body.bypass_plan_cache
+    )
+
+async def save_plan(body: PlanInput, explained_investments: List[Dict[str, Any]], idempotency_key: Optional[str] = None, portfolio: Optional[Dict[str, Any]] = None):
+    """Persist the flattened workflow output as an investment plan."""
+    # Create investment plan in database using the proper model
+    plan_data = InvestmentPlanCreate(
+        user_id=MOCK_USER_ID,
+        user_context=body.user_context,
+        message=body.message,
+        likes=body.likes,
+        investments=explained_investments,
+        portfolio=portfolio,
+        idempotency_key=idempotency_key
+    )
+    
+    logger.debug("Created plan data: %s", plan_data)
+    
+    # Save to database
+    with span("mongo_write"):
+        return await create_investment_plan(plan_data)
+
+async def generate_plan(body: PlanInput, idempotency_key: Optional[str] = None) -> PlanResponse:
+    """Run the AI workflow and save the resulting plan."""
+    # Create investment plan using the AI workflow
+    initial_state = build_initial_state(body)
+    
+    logger.debug("Initial state: %s", initial_state)
+    with llm_deadline(PLAN_DEADLINE_SECONDS):
+        result = await get_graph().ainvoke(initial_state)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("AI workflow result: %s", json.dumps(result, default=str, indent=2))
+    
+    # Extract and flatten the investment data
+    with span("serialization"):
+        explained_investments = [
+            extract_investment_data(investment_dict)
+            for investment_dict in result.get('explained_investments', [])
+        ]
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted investments: %s", json.dumps(explained_investments, indent=2))
+    
+    try:
+        saved_plan = await save_plan(body, explained_investments, idempotency_key, result.get("portfolio"))
+    except DuplicateKeyError:
+        # Another replica saved a plan for this key first, return that one
+        saved_plan = await get_investment_plan_by_idempotency_key(idempotency_key)
+        if saved_plan is None:
+            raise
+    
+    return PlanResponse(
+        plan_id=str(saved_plan.id),
+        investments=saved_plan.investments,
+        message=saved_plan.message,
+        created_at=saved_plan.created_at,
+        portfolio=saved_plan.portfolio
+    )
 
 @app.post('/plan', response_model=PlanResponse)
-async def create_plan(body: PlanInput):
+async def create_plan(body: PlanInput, idempotency_key: Optional[str] = Header(default=None)):
+    """Create an investment plan.
+
+    Identical concurrent requests share a single workflow run. When an
+    `Idempotency-Key` header is sent, retries with the same key return the
+    plan that was saved for it instead of building a new one.
+    """
     try:
-        # Create investment plan using the AI workflow
-        initial_state = InvestmentGraphState(
-            user_context=body.user_context,
-            explained_investments=[],
-            investments=[],
-            user_message=body.message
-        )
-        
-        print(f"🔍 Initial state: {initial_state}")
-        result = graph.invoke(initial_state)
-        print(f"🔍 AI workflow result: {json.dumps(result, default=str, indent=2)}")
-        
-        # Extract and flatten the investment data
-        explained_investments = []
-        for investment_dict in result.get('explained_investments', []):
-            extracted = extract_investment_data(investment_dict)
-            explained_investments.append(extracted)
-        
-        print(f"🔍 Extracted investments: {json.dumps(explained_investments, indent=2)}")
+        if idempotency_key:
+            existing_plan = await get_investment_plan_by_idempotency_key(idempotency_key)
+            if existing_plan:
+                return PlanResponse(
+                    plan_id=str(existing_plan.id),
+                    investments=existing_plan.investments,
+                    message=existing_plan.message,
+                    created_at=existing_plan.created_at,
+                    portfolio=existing_plan.portfolio
+                )
+            flight_key = f"idempotency:{idempotency_key}"
+        else:
+            flight_key = f"body:{request_key(body.model_dump())}"
         
-        # For now, we'll create a mock user_id (in production, you'd get this from authentication)
-        # You can modify this to use actual user authentication
-        mock_user_id = "mock_user_123"  # Simple string ID
+        return await plan_flights.do(flight_key, lambda: generate_plan(body, idempotency_key))
         
-        # Create investment plan in database using the proper model
-        plan_data = InvestmentPlanCreate(
-            user_id=mock_user_id,
+    except Exception as e:
+        logger.exception("Error creating plan")
+        raise HTTPException(status_code=500, detail=f"Error creating plan: {str(e)}")
+
+def format_stream_event(event: str, data: Dict[str, Any], sse: bool) -> str:
+    """Encode a stream event as an SSE message or an NDJSON line."""
+    payload = json.dumps({"event": event, **data}, default=str)
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+async def stream_plan_events(body: PlanInput, sse: bool):
+    """Run the AI workflow and yield events as each node finishes."""
+    explained_investments = []
+    portfolio = None
+    try:
+        with llm_deadline(PLAN_DEADLINE_SECONDS):
+            async for update in get_graph().astream(build_initial_state(body), stream_mode="updates"):
+                for node, node_output in update.items():
+                    if node == "investment_plan":
+                        investments = [
+                            extract_investment_data({"investment": investment})
+                            for investment in node_output.get("investments", [])
+                        ]
+                        portfolio = node_output.get("portfolio")
+                        yield format_stream_event("investments", {"investments": investments, "portfolio": portfolio}, sse)
+                    elif node in EXPLAIN_NODES:
+                        for investment_dict in node_output.get("explained_investments", []):
+                            extracted = extract_investment_data(investment_dict)
+                            explained_investments.append(extracted)
+                            yield format_stream_event("investment", {"investment": extracted}, sse)
+
+        saved_plan = await save_plan(body, explained_investments, portfolio=portfolio)
+        yield format_stream_event("saved", {
+            "plan_id": str(saved_plan.id),
+            "created_at": saved_plan.created_at
+        }, sse)
+    except Exception as e:
+        logger.exception("Error streaming plan")
+        yield format_stream_event("error", {"detail": f"Error creating plan: {str(e)}"}, sse)
+
+@app.post('/plan/stream')
+async def create_plan_stream(body: PlanInput, request: Request):
+    """Create a plan, streaming the investments as soon as they are ready.
+
+    Emits an `investments` event with the planner output, one `investment`
+    event per explained investment and a final `saved` event with the
+    plan_id. Responds with Server-Sent Events when the client accepts
+    `text/event-stream`, NDJSON otherwise.
+    """
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_plan_events(body, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_plan_job(plan_id: str, body: PlanInput):
+    """Run the AI workflow for a submitted plan, recording progress on the plan."""
+    investments = []
+    explained_investments = []
+    try:
+        await update_investment_plan(plan_id, {"status": "planning"})
+        total = 0
+        with llm_deadline(PLAN_DEADLINE_SECONDS):
+            async for update in get_graph().astream(build_initial_state(body), stream_mode="updates"):
+                for node, node_output in update.items():
+                    if node == "investment_plan":
+                        investments = [
+                            extract_investment_data({"investment": investment})
+                            for investment in node_output.get("investments", [])
+                        ]
+                        total = len(investments)
+                        await update_investment_plan(plan_id, {
+                            "status": "explaining",
+                            "progress": f"0/{total}",
+                            "investments": investments,
+                            "portfolio": node_output.get("portfolio")
+                        })
+                    elif node in EXPLAIN_NODES:
+                        explanations = {}
+                        for investment_dict in node_output.get("explained_investments", []):
+                            extracted = extract_investment_data(investment_dict)
+                            explained_investments.append(extracted)
+                            # Fill in the explanation of the matching planned investment
+                            for index, investment in enumerate(investments):
+                                if investment["name"] == extracted["name"] and not investment["explanation"]:
+                                    investment["explanation"] = extracted["explanation"]
+                                    explanations[f"investments.{index}.explanation"] = extracted["explanation"]
+                                    break
+                        # Only the new explanations, the investments (and rollups) are unchanged
+                        await update_investment_plan(plan_id, {
+                            "progress": f"{len(explained_investments)}/{total}",
+                            **explanations
+                        })
+
+        await update_investment_plan(plan_id, {
+            "status": "done",
+            "progress": f"{len(explained_investments)}/{total}",
+            "investments": explained_investments
+        })
+    except Exception as e:
+        logger.exception("Error running plan job %s", plan_id)
+        await update_investment_plan(plan_id, {"status": "failed", "error": str(e)})
+        raise
+
+@app.post('/plan/jobs', response_model=PlanJobResponse, status_code=202)
+async def submit_plan_job(body: PlanInput, idempotency_key: Optional[str] = Header(default=None)):
+    """Submit a plan to be built in the background.
+
+    Returns the plan_id right away; poll `GET /plan/{plan_id}` for the
+    status (pending, planning, explaining, done or failed), the progress
+    and the investments explained so far. Resubmitting with the same
+    `Idempotency-Key` header returns the existing job's plan.
+    """
+    if idempotency_key:
+        existing_plan = await get_investment_plan_by_idempotency_key(idempotency_key)
+        if existing_plan:
+            return PlanJobResponse(plan_id=str(existing_plan.id), status=existing_plan.status)
+
+    try:
+        plan = await create_investment_plan(InvestmentPlanCreate(
+            user_id=MOCK_USER_ID,
             user_context=body.user_context,
             message=body.message,
             likes=body.likes,
-            investments=explained_investments,
-            explained_investments=explained_investments
-        )
-        
-        print(f"🔍 Created plan data: {plan_data.model_dump()}")
-        
-        # Save to database
-        saved_plan = await create_investment_plan(plan_data)
-        
-        return PlanResponse(
-            plan_id=str(saved_plan.id),
-            investments=explained_investments,
-            message=body.message,
-            created_at=saved_plan.created_at
-        )
-        
+            investments=[],
+            status="pending",
+            idempotency_key=idempotency_key
+        ))
+    except DuplicateKeyError:
+        existing_plan = await get_investment_plan_by_idempotency_key(idempotency_key)
+        return PlanJobResponse(plan_id=str(existing_plan.id), status=existing_plan.status)
     except Exception as e:
-        print(f"❌ Error creating plan: {str(e)}")
-        import traceback
-        traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error creating plan: {str(e)}")
 
-@app.get('/plans/{user_id}', response_model=List[Dict[str, Any]])
-async def get_user_plans(user_id: str, limit: int = 10):
-    """Get all investment plans for a specific user."""
+    plan_id = str(plan.id)
     try:
-        plans = await get_investment_plans_by_user(user_id, limit)
-        return [plan.model_dump() for plan in plans]
+        await job_backend.submit(plan_id, lambda: run_plan_job(plan_id, body))
+    except asyncio.QueueFull:
+        await update_investment_plan(plan_id, {"status": "failed", "error": "Job queue is full"})
+        raise HTTPException(status_code=503, detail="Too many plans in progress, try again later")
+
+    return PlanJobResponse(plan_id=plan_id, status=plan.status)
+
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+
+def parse_ndjson_line(line: bytes, model):
+    """Parse one NDJSON line into `model`, returning the error instead of raising it."""
+    try:
+        return model.model_validate_json(line)
+    except ValueError as e:
+        return e
+
+async def parse_ndjson_lines(request: Request, model):
+    """Parse an NDJSON request body into `model` items as it arrives."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse_ndjson_line(line, model)
+    if buffer.strip():
+        yield parse_ndjson_line(buffer, model)
+
+def iterate_spooled_file(spooled_file, chunk_size: int = 64 * 1024):
+    try:
+        while chunk := spooled_file.read(chunk_size):
+            yield chunk
+    finally:
+        spooled_file.close()
+
+async def bulk_results_response(results_iterator, label: str) -> StreamingResponse:
+    """Spool per-item bulk results and stream them back as NDJSON.
+
+    Results are spooled to a temporary file so memory stays bounded however
+    many items are sent; the totals are in the X-Bulk-Inserted /
+    X-Bulk-Failed headers.
+    """
+    results = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    inserted = 0
+    failed = 0
+    try:
+        async for result in results_iterator:
+            if result["success"]:
+                inserted += 1
+            else:
+                failed += 1
+            results.write(json.dumps(result).encode("utf-8") + b"\n")
+    except Exception as e:
+        results.close()
+        raise HTTPException(status_code=500, detail=f"Error importing {label}: {str(e)}")
+
+    results.seek(0)
+    return StreamingResponse(
+        iterate_spooled_file(results),
+        media_type="application/x-ndjson",
+        headers={"X-Bulk-Inserted": str(inserted), "X-Bulk-Failed": str(failed)}
+    )
+
+@app.post('/plans/bulk')
+async def bulk_create_plans(request: Request, chunk_size: int = Query(default=BULK_INSERT_CHUNK_SIZE, ge=1, le=10000)):
+    """Import investment plans in bulk.
+
+    The body is NDJSON, one InvestmentPlanCreate per line, and is inserted
+    in unordered chunks of `chunk_size` as it's read. The response is NDJSON
+    with one result per input line (`index`, `success`, and `plan_id` or
+    `error`).
+    """
+    plans = parse_ndjson_lines(request, InvestmentPlanCreate)
+    return await bulk_results_response(create_investment_plans_bulk(plans, chunk_size), "plans")
+
+@app.get('/plans/{user_id}', response_model=InvestmentPlanSummaryPage)
+async def get_user_plans(user_id: str, limit: int = Query(default=10, ge=1, le=100), cursor: Optional[str] = None):
+    """Get a page of investment plan summaries for a specific user.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page. Full
+    plans are served by `GET /plan/{plan_id}`.
+    """
+    try:
+        summaries, next_cursor = await get_investment_plan_summaries(user_id, limit, cursor)
+        return InvestmentPlanSummaryPage(items=summaries, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching plans: {str(e)}")
 
 @app.get('/plan/{plan_id}', response_model=Dict[str, Any])
-async def get_plan(plan_id: str):
-    """Get a specific investment plan by ID."""
+async def get_plan(plan_id: str, include_explanations: bool = True):
+    """Get a specific investment plan by ID.
+
+    Pass `include_explanations=false` to skip the explanations and fetch
+    them later from `GET /plan/{plan_id}/explanations`. Stored plans are
+    trusted, so they're encoded as they are instead of being validated again.
+    """
     try:
-        plan = await get_investment_plan_by_id(plan_id)
+        plan = await get_investment_plan_document(plan_id, include_explanations)
         if not plan:
             raise HTTPException(status_code=404, detail="Plan not found")
-        return plan.model_dump()
+        with span("serialization"):
+            return ORJSONResponse(plan)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching plan: {str(e)}")
 
+def revision_steps(plan, revision: PlanRevision):
+    """What a revision needs recomputed, and the plan's new total.
+
+    Returns ["plan"] when the intent changes (the message asks for something
+    else, or the user context changed), otherwise any of "amounts" (the
+    total changed, amounts are rescaled from the stored percentages by
+    portfolio.normalize_portfolio) and
+    "explanations" (the likes changed).
+
+    The plan's amount in its message is the number that states the plan's
+    total, never just any number in it ("retirarme en 2045" is a year). A
+    message that only changes that number, or adds one to a message that
+    didn't state the total, is a new total; any other change to the message
+    is a new intent.
+
+    A re-plan is rescaled to the returned total: `amount` when given, else
+    the message's new total when only that changed, else the current total
+    (which may come from an earlier `amount`) when the message is unchanged,
+    else None to keep the planner's total, as the planner read the message.
+    """
+    message = plan.message if revision.message is None else revision.message
+    user_context = {**plan.user_context, **(revision.user_context or {})}
+    current_total = sum(investment.amount for investment in plan.investments)
+    stated = states_amount(plan.message, current_total)
+    idea = message_idea(plan.message, current_total if stated else None)
+    # Which number of the new message, if any, takes the place of the plan's total
+    candidates = find_amounts(message) if stated else [None, *find_amounts(message)]
+    matches = [amount for amount in candidates if message_idea(message, amount) == idea]
+    stated_total = None
+    if matches:
+        stated_total = current_total if matches[0] is None else matches[0]
+    if user_context != plan.user_context or not matches:
+        return ["plan"], revision.amount if revision.amount is not None else stated_total
+
+    steps = []
+    total = revision.amount if revision.amount is not None else stated_total
+    if abs(total - current_total) > 0.01:
+        steps.append("amounts")
+    if revision.likes is not None and sorted(map(normalize_text, revision.likes)) != sorted(map(normalize_text, plan.likes)):
+        steps.append("explanations")
+    return steps, total
+
+@app.patch('/plan/{plan_id}', response_model=PlanRevisionResponse)
+async def revise_plan(plan_id: str, revision: PlanRevision):
+    """Revise a saved plan, recomputing only what the change needs.
+
+    A new total (`amount`, or a message that only changes the amount)
+    rescales the stored investments, new likes only re-run the
+    explanations, and a message asking for something else or a new user
+    context re-runs the whole workflow, rescaled to the plan's total (see
+    revision_steps). A new `amount` is also restated in the stored message
+    when the message's amount was the plan's total. `user_context` is merged
+    into the stored one. `recomputed` lists what was redone.
+    """
+    plan = await get_investment_plan_by_id(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if plan.status in ("pending", "planning", "explaining"):
+        raise HTTPException(status_code=409, detail=f"Plan is still being built ({plan.status})")
+
+    steps, total = revision_steps(plan, revision)
+    message = plan.message if revision.message is None else revision.message
+    current_total = sum(investment.amount for investment in plan.investments)
+    if revision.amount is not None and revision.message is None and abs(revision.amount - current_total) > 0.01:
+        # Keep the message in line with the plan, the planner reads it on a re-plan
+        message = replace_amount(message, current_total, revision.amount)
+    likes = plan.likes if revision.likes is None else revision.likes
+    user_context = {**plan.user_context, **(revision.user_context or {})}
+    investments = [investment.model_dump() for investment in plan.investments]
+    portfolio = plan.portfolio
+    try:
+        if "plan" in steps:
+            body = PlanInput(user_context=user_context, message=message, likes=likes)
+            with llm_deadline(PLAN_DEADLINE_SECONDS):
+                result = await get_graph().ainvoke(build_initial_state(body))
+            with span("serialization"):
+                investments = [extract_investment_data(item) for item in result.get('explained_investments', [])]
+            portfolio = result.get("portfolio")
+        if "amounts" in steps or ("plan" in steps and total is not None):
+            # A re-plan is rescaled too, so an explicit or earlier total isn't lost
+            with span("portfolio"):
+                investments, portfolio = normalize_portfolio(investments, total)
+        if "explanations" in steps:
+            with llm_deadline(PLAN_DEADLINE_SECONDS):
+                investments = await explain_investments(investments, likes, uuid.uuid4().hex)
+
+        if steps or message != plan.message or revision.likes is not None:
+            with span("mongo_write"):
+                updated = await update_investment_plan(plan_id, {
+                    "message": message,
+                    "likes": likes,
+                    "user_context": user_context,
+                    "investments": investments,
+                    "portfolio": portfolio
+                })
+            if not updated:
+                # Deleted while it was being revised
+                raise HTTPException(status_code=404, detail="Plan not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error revising plan %s", plan_id)
+        raise HTTPException(status_code=500, detail=f"Error revising plan: {str(e)}")
+
+    return PlanRevisionResponse(
+        plan_id=plan_id,
+        investments=investments,
+        message=message,
+        created_at=plan.created_at,
+        portfolio=portfolio,
+        recomputed=steps
+    )
+
+@app.get('/plan/{plan_id}/explanations', response_model=List[InvestmentExplanation])
+async def get_plan_explanations(plan_id: str):
+    """Get the explanation of each investment in a plan."""
+    try:
+        explanations = await get_investment_plan_explanations(plan_id)
+        if explanations is None:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        return explanations
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching explanations: {str(e)}")
+
+@app.get('/news/{country}')
+async def get_news(country: str):
+    """Get the prefetched news digest the planner uses for a country.
+
+    Only the countries in NEWS_COUNTRIES have digests. Asking for one that
+    hasn't been fetched yet starts a refresh in the background.
+    """
+    digest = await news_digests.get(country)
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No news digest for this country")
+    return digest
+
+@app.get('/analytics/popular')
+async def popular_investments(limit: int = Query(default=10, ge=1, le=100)):
+    """Get the most recommended investments across all users."""
+    return await get_popular_investments(limit)
+
+@app.get('/analytics/users/{user_id}/summary')
+async def user_investment_summary(user_id: str):
+    """Get the investments recommended to a user, by total amount."""
+    return await get_user_investment_summary(user_id)
+
 @app.post('/users', response_model=User)
 async def create_user_endpoint(user_data: UserCreate):
     """Create a new user."""
@@ -216,6 +726,19 @@ async def create_user_endpoint(user_data: UserCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
+@app.post('/users/bulk')
+async def bulk_create_users(request: Request, chunk_size: int = Query(default=BULK_INSERT_CHUNK_SIZE, ge=1, le=10000)):
+    """Import users in bulk.
+
+    The body is NDJSON, one UserCreate per line. Each user is created with
+    the same atomic upsert as `POST /users`, batched in unordered chunks of
+    `chunk_size`. The response is NDJSON with one result per input line
+    (`index`, `success`, and `user_id` or `error`); emails that are already
+    taken fail individually without affecting the rest.
+    """
+    users = parse_ndjson_lines(request, UserCreate)
+    return await bulk_results_response(create_users_bulk(users, chunk_size), "users")
+
 @app.get('/users/{email}', response_model=User)
 async def get_user(email: str):
     """Get user by email."""
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 
 # User Models
 class UserBase(BaseModel):
@@ -44,12 +44,30 @@ class InvestmentAmountWithId(InvestmentAmount):
     }
 
 # Investment Plan Models
+# Version 2 stores each investment once, with its explanation inline.
+# Version 1 documents also carried a full copy of the list in explained_investments.
+PLAN_SCHEMA_VERSION = 2
+
+def upgrade_plan_document(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Read a version 1 plan document as a version 2 one."""
+    explained = plan_data.pop("explained_investments", None)
+    if explained and len(explained) >= len(plan_data.get("investments") or []):
+        plan_data["investments"] = explained
+    plan_data["schema_version"] = PLAN_SCHEMA_VERSION
+    return plan_data
+
 class InvestmentPlanBase(BaseModel):
     user_context: Dict[str, Any]
     message: str
     likes: List[str]
     investments: List[InvestmentAmount]
-    explained_investments: List[InvestmentAmount]
+    # Portfolio level stats and repairs, see portfolio.normalize_portfolios
+    portfolio: Optional[Dict[str, Any]] = None
+    # Job status: pending, planning, explaining, done or failed
+    status: str = "done"
+    progress: Optional[str] = None
+    error: Optional[str] = None
+    idempotency_key: Optional[str] = None
 
 class InvestmentPlanCreate(InvestmentPlanBase):
     user_id: str
@@ -59,23 +77,70 @@ class InvestmentPlan(InvestmentPlanBase):
     user_id: str
     created_at: datetime
     updated_at: datetime
+    schema_version: int = PLAN_SCHEMA_VERSION
 
     model_config = {
         "populate_by_name": True,
         "arbitrary_types_allowed": True
     }
 
+    @model_validator(mode="before")
+    @classmethod
+    def upgrade_legacy_document(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "explained_investments" in data:
+            return upgrade_plan_document(dict(data))
+        return data
+
+class InvestmentExplanation(BaseModel):
+    name: str
+    explanation: Optional[str] = None
+
+class InvestmentPlanSummary(BaseModel):
+    # Read from the document's `_id`, returned as `id` like InvestmentPlan.model_dump()
+    id: str = Field(validation_alias="_id", serialization_alias="id")
+    user_id: str
+    message: str
+    status: str = "done"
+    investment_names: List[str] = []
+    investment_count: int = 0
+    total_amount: float = 0
+    created_at: datetime
+
+    model_config = {
+        "populate_by_name": True
+    }
+
+class InvestmentPlanSummaryPage(BaseModel):
+    items: List[InvestmentPlanSummary]
+    next_cursor: Optional[str] = None
+
 # API Request/Response Models
 class PlanInput(BaseModel):
     user_context: Dict[str, Any]
     message: str
     likes: List[str]
+    bypass_plan_cache: bool = False
 
 class PlanResponse(BaseModel):
     plan_id: str
     investments: List[InvestmentAmount]
     message: str
     created_at: datetime
+    portfolio: Optional[Dict[str, Any]] = None
+
+class PlanRevision(BaseModel):
+    """Changes to a saved plan's input, fields left out keep their stored value"""
+    message: Optional[str] = None
+    likes: Optional[List[str]] = None
+    user_context: Optional[Dict[str, Any]] = None
+    amount: Optional[float] = Field(default=None, gt=0, description="New total to invest, overrides the amount in the message")
+
+class PlanRevisionResponse(PlanResponse):
+    recomputed: List[str]
+
+class PlanJobResponse(BaseModel):
+    plan_id: str
+    status: str
 
 # Database Response Models
 class DatabaseResponse(BaseModel):
@@ -39,7 +39,16 @@ db.createCollection('investment_plans', {
         message: { bsonType: 'string' },
         likes: { bsonType: 'array' },
         investments: { bsonType: 'array' },
+        // Legacy (schema_version 1) copy of investments, see the migration below
         explained_investments: { bsonType: 'array' },
+        schema_version: { bsonType: 'int' },
+        status: {
+          bsonType: 'string',
+          enum: ['pending', 'planning', 'explaining', 'done', 'failed']
+        },
+        progress: { bsonType: ['string', 'null'] },
+        error: { bsonType: ['string', 'null'] },
+        idempotency_key: { bsonType: ['string', 'null'] },
         created_at: { bsonType: 'date' },
         updated_at: { bsonType: 'date' }
       }
@@ -67,22 +76,37 @@ db.createCollection('investments', {
   }
 });
 
-// Create indexes for better performance
+// Create indexes for better performance. This script only runs on an empty
+// data directory; the app creates any of these that are missing when it
+// connects (database.INDEXES, `python cli.py ensure-indexes`), so keep both
+// lists in sync.
 db.users.createIndex({ "email": 1 }, { unique: true });
 db.users.createIndex({ "country": 1 });
 db.users.createIndex({ "investment_profile": 1 });
 
 db.investment_plans.createIndex({ "user_id": 1 });
 db.investment_plans.createIndex({ "created_at": -1 });
-db.investment_plans.createIndex({ "user_id": 1, "created_at": -1 });
+// Covers the (created_at, _id) keyset sort of the paginated user plan summaries
+db.investment_plans.createIndex({ "user_id": 1, "created_at": -1, "_id": -1 });
+db.investment_plans.createIndex(
+  { "idempotency_key": 1 },
+  { unique: true, partialFilterExpression: { idempotency_key: { $type: "string" } } }
+);
 
 db.investments.createIndex({ "risk": 1 });
 db.investments.createIndex({ "ease_of_use": 1 });
 db.investments.createIndex({ "created_at": -1 });
 
-// Create a compound index for user plans
-db.investment_plans.createIndex({ "user_id": 1, "created_at": -1 });
+// Shared explanation cache, expired entries are removed by the TTL monitor
+db.explanation_cache.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
+
+// Country news digests served to the planner, expired digests are removed by the TTL monitor
+db.news_digests.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
+
+// Analytics rollups, kept up to date on every plan write
+db.investment_rollups.createIndex({ "mentions": -1 });
+db.user_investment_rollups.createIndex({ "user_id": 1, "total_amount": -1 });
 
 print('✅ MongoDB initialized successfully for Investing Agent!');
-print('📊 Collections created: users, investment_plans, investments');
+print('📊 Collections created: users, investment_plans, investments, explanation_cache, news_digests, investment_rollups, user_investment_rollups');
 print('🔍 Indexes created for optimal query performance');
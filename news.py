@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from agents.news_agent.agent import NewsAgentBuilder
+from cache import TTLCache, normalize_text
+from llm import model_registry
+from singleflight import SingleFlight
+from telemetry import record_cache_lookup, record_usage, span
+
+logger = logging.getLogger("open_invest.news")
+
+class SearchBackend(ABC):
+    """Interface for the web search behind the news digests"""
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Return results as dicts with a title, url and content snippet."""
+        pass
+
+class TavilySearchBackend(SearchBackend):
+    """Tavily web search, needs TAVILY_API_KEY."""
+
+    def __init__(self) -> None:
+        self._tools: Dict[int, Any] = {}
+
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        if max_results not in self._tools:
+            # Imported here so the app starts without it when news is off
+            from langchain_tavily import TavilySearch
+
+            self._tools[max_results] = TavilySearch(max_results=max_results, topic="news")
+        response = await self._tools[max_results].ainvoke({"query": query})
+        return [
+            {"title": result.get("title", ""), "url": result.get("url", ""), "content": (result.get("content") or "")[:500]}
+            for result in response.get("results", [])
+        ]
+
+class FakeSearchBackend(SearchBackend):
+    """Canned results for tests and offline runs, never calls a provider."""
+
+    def __init__(self) -> None:
+        self.searches = 0
+
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        self.searches += 1
+        return [
+            {"title": f"Fake headline {i + 1} for: {query}", "url": f"https://example.com/news/{i + 1}", "content": "Fake news content."}
+            for i in range(min(max_results, 3))
+        ]
+
+def create_search_backend() -> SearchBackend:
+    """Build the search backend configured by NEWS_SEARCH_BACKEND."""
+    backend = os.getenv("NEWS_SEARCH_BACKEND", "tavily").lower()
+    if backend == "tavily":
+        return TavilySearchBackend()
+    if backend == "fake":
+        return FakeSearchBackend()
+    raise ValueError(f"Unknown news search backend: {backend}")
+
+class NewsDigestService:
+    """Country news digests, prefetched on a schedule and served to the planner.
+
+    A background task refreshes the digest of every configured country
+    (NEWS_COUNTRIES) each
+    `refresh_interval_seconds`: one search plus one news model call, stored
+    in MongoDB with a `ttl_seconds` expiry and kept in process for the
+    planner. Reads never search: a country without a digest gets none and
+    a refresh is started in the background. Concurrent refreshes of a
+    country share one run in process, and a lease in MongoDB keeps replicas
+    from refreshing the same country at once.
+    """
+
+    def __init__(
+        self,
+        search: SearchBackend,
+        enabled: bool = False,
+        countries: Optional[List[str]] = None,
+        refresh_interval_seconds: float = 3600,
+        ttl_seconds: float = 6 * 3600,
+        lease_seconds: float = 120,
+        max_results: int = 10,
+    ) -> None:
+        self.search = search
+        self.enabled = enabled
+        self.countries = countries or ["Argentina"]
+        self._country_keys = {normalize_text(country) for country in self.countries}
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.max_results = max_results
+        # Cap the in-process copy so refreshes done by other replicas show up
+        self.memory = TTLCache(max_entries=1000, ttl_seconds=min(refresh_interval_seconds, ttl_seconds))
+        self._flights = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        # Country key -> time.monotonic() before which a miss doesn't start another refresh
+        self._retry_after: Dict[str, float] = {}
+        self.refreshes = 0
+        self.skipped_refreshes = 0
+        self.failed_refreshes = 0
+
+    @classmethod
+    def from_env(cls) -> "NewsDigestService":
+        return cls(
+            search=create_search_backend(),
+            enabled=os.getenv("NEWS_ENABLED", "false").lower() == "true",
+            countries=[country.strip() for country in os.getenv("NEWS_COUNTRIES", "Argentina").split(",") if country.strip()],
+            refresh_interval_seconds=float(os.getenv("NEWS_REFRESH_INTERVAL_SECONDS", "3600")),
+            ttl_seconds=float(os.getenv("NEWS_DIGEST_TTL_SECONDS", str(6 * 3600))),
+            lease_seconds=float(os.getenv("NEWS_REFRESH_LEASE_SECONDS", "120")),
+            max_results=int(os.getenv("NEWS_MAX_RESULTS", "10")),
+        )
+
+    async def start(self) -> None:
+        if self.enabled and self.refresh_interval_seconds > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+            logger.info("Refreshing news digests for %s every %.0fs", ", ".join(self.countries), self.refresh_interval_seconds)
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._task, *self._background) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._background.clear()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            for country in self.countries:
+                await self._refresh_quietly(country)
+            await asyncio.sleep(self.refresh_interval_seconds)
+
+    async def _refresh_quietly(self, country: str) -> None:
+        try:
+            await self.refresh(country)
+        except Exception as e:
+            logger.warning("News refresh for %s failed: %s", country, e)
+
+    async def get(self, country: str) -> Optional[Dict[str, Any]]:
+        """The stored digest of a configured country, or None, starting a refresh on a miss."""
+        key = normalize_text(str(country or ""))
+        if not self.enabled or key not in self._country_keys:
+            # Only configured countries are searched, user input never adds any
+            return None
+        digest = self.memory.get(key)
+        if digest is None:
+            # Imported here to keep the service usable without a database
+            from database import get_news_digest
+            try:
+                digest = await get_news_digest(key)
+            except Exception as e:
+                logger.warning("News digest lookup failed: %s", e)
+            if digest is not None:
+                self.memory.set(key, digest)
+        record_cache_lookup("news", digest is not None)
+        if digest is None and time.monotonic() >= self._retry_after.get(key, 0):
+            # Until the lease runs out a refresh is in flight here or on another replica
+            self._retry_after[key] = time.monotonic() + self.lease_seconds
+            self._refresh_in_background(country)
+        return digest
+
+    async def context(self, country: str) -> Optional[str]:
+        """The digest summary to add to the planner prompt, if there's one."""
+        digest = await self.get(country)
+        return digest["summary"] if digest else None
+
+    def _refresh_in_background(self, country: str) -> None:
+        task = asyncio.ensure_future(self._refresh_quietly(country))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def refresh(self, country: str) -> Optional[Dict[str, Any]]:
+        """Build and store a fresh digest, or None when another replica is on it."""
+        key = normalize_text(country)
+        return await self._flights.do(key, lambda: self._refresh(key, country))
+
+    async def _refresh(self, key: str, country: str) -> Optional[Dict[str, Any]]:
+        from database import claim_news_refresh, save_news_digest
+
+        if not await claim_news_refresh(key, self.lease_seconds):
+            self.skipped_refreshes += 1
+            return None
+        try:
+            digest = await self.build_digest(country)
+            await save_news_digest(key, digest, self.ttl_seconds)
+        except Exception:
+            self.failed_refreshes += 1
+            raise
+        self.memory.set(key, digest)
+        self.refreshes += 1
+        return digest
+
+    async def build_digest(self, country: str) -> Dict[str, Any]:
+        """Search the country's financial news and condense it with the news model."""
+        with span("news_search"):
+            results = await self.search.search(f"{country} financial news for investors", self.max_results)
+        listing = "\n".join(f"- {result['title']} ({result['url']}): {result['content']}" for result in results)
+        with span("news_digest"):
+            message = await NewsAgentBuilder(model_registry.get("news")).build().ainvoke({
+                "country": country,
+                "results": listing or "No results",
+            })
+        record_usage("news", message)
+        return {
+            "country": country,
+            "headlines": [{"title": result["title"], "url": result["url"]} for result in results],
+            "summary": message.content,
+            "fetched_at": datetime.utcnow(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "countries": self.countries,
+            "refresh_interval_seconds": self.refresh_interval_seconds,
+            "ttl_seconds": self.ttl_seconds,
+            "refreshes": self.refreshes,
+            "skipped_refreshes": self.skipped_refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "shared_refreshes": self._flights.shared,
+            "memory": self.memory.stats(),
+        }
+
+news_digests = NewsDigestService.from_env()
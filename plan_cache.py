@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import TTLCache, normalize_text
+from telemetry import record_cache_lookup
+
+DEFAULT_KEY_FIELDS = "country,investmentProfile,age,amount,idea"
+DEFAULT_AMOUNT_BANDS = "1000,5000,20000,100000,500000"
+
+_AMOUNT_PATTERN = re.compile(r"(\d[\d.,]*)\s*(k|mil|m|millones|millon|million)?\b", re.IGNORECASE)
+_MULTIPLIERS = {"k": 1_000, "mil": 1_000, "m": 1_000_000, "millon": 1_000_000, "millones": 1_000_000, "million": 1_000_000}
+
+def _find_amounts(message: str) -> List[Tuple[float, int, int]]:
+    """Every amount in the message, with the span of text it was read from."""
+    amounts = []
+    for match in _AMOUNT_PATTERN.finditer(message or ""):
+        number, suffix = match.groups()
+        digits = number.rstrip(".,")
+        # Treat "6.000" and "6,000" as thousands separators, "6000.50" as decimals,
+        # and when both appear ("12.500,50") the last one is the decimal mark
+        if "," in digits and "." in digits:
+            decimal_mark = "," if digits.rfind(",") > digits.rfind(".") else "."
+            thousands_mark = "." if decimal_mark == "," else ","
+            digits = digits.replace(thousands_mark, "").replace(decimal_mark, ".")
+        elif re.fullmatch(r"\d{1,3}([.,]\d{3})+", digits):
+            digits = re.sub(r"[.,]", "", digits)
+        else:
+            digits = digits.replace(",", ".")
+        try:
+            value = float(digits)
+        except ValueError:
+            continue
+        value *= _MULTIPLIERS.get(suffix.lower(), 1) if suffix else 1
+        # The span ends at the number or its suffix, not at the spaces the pattern also takes
+        amounts.append((value, match.start(), match.end(2) if suffix else match.end(1)))
+    return amounts
+
+def parse_amount(message: str) -> Optional[float]:
+    """The amount in the user message ("6000", "6.000", "10k") when it's the only number in it.
+
+    None when there is no number, or when there are several (a year, an age,
+    a second amount) and which one is the amount isn't known.
+    """
+    amounts = _find_amounts(message)
+    return amounts[0][0] if len(amounts) == 1 else None
+
+def find_amounts(message: str) -> List[float]:
+    """Every amount mentioned in the user message, in order."""
+    return [amount[0] for amount in _find_amounts(message)]
+
+def _stated_amount(message: str, amount: Optional[float]) -> Optional[Tuple[float, int, int]]:
+    # The first number in the message that states `amount`
+    if amount is None:
+        return None
+    return next((found for found in _find_amounts(message) if abs(found[0] - amount) <= 0.01), None)
+
+def states_amount(message: str, amount: float) -> bool:
+    """Whether the message mentions `amount` ("10000", "10.000", "10k" for 10000)."""
+    return _stated_amount(message, amount) is not None
+
+def replace_amount(message: str, amount: float, new_amount: float) -> str:
+    """The message with the number that states `amount` restated as `new_amount`."""
+    found = _stated_amount(message, amount)
+    if found is None:
+        return message
+    text = f"{new_amount:.0f}" if float(new_amount).is_integer() else f"{new_amount:.2f}"
+    return f"{message[:found[1]]}{text}{message[found[2]:]}"
+
+def message_idea(message: str, amount: Optional[float] = None) -> str:
+    """What a user message asks for, without the number that states `amount`.
+
+    Only that one number is removed: any other (a year, an age, a second
+    amount) is part of what the message asks for. With no `amount`, or one
+    the message doesn't mention, the whole message is the idea.
+    """
+    message = message or ""
+    found = _stated_amount(message, amount)
+    if found is not None:
+        message = f"{message[:found[1]]} {message[found[2]:]}"
+    return normalize_text(message)
+
+class PlanCache:
+    """Reuses planner output for requests that fall in the same bucket.
+
+    Requests are bucketed on user context fields (country, investment
+    profile, age band, amount band) and on the idea they express with the
+    amount stripped out (message_idea). Only messages whose amount is
+    unambiguous (parse_amount) are cached, and only plans the planner
+    totalled to that amount are stored, with their total. A hit returns the
+    stored plan skeleton (assets and percentages) with amounts rescaled from
+    the stored total to the requested one, skipping the planner LLM call. Which fields form the bucket, the band sizes and the
+    TTL are configured from the environment.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        key_fields: str = DEFAULT_KEY_FIELDS,
+        age_band_years: int = 10,
+        amount_bands: str = DEFAULT_AMOUNT_BANDS,
+        ttl_seconds: float = 24 * 3600,
+        max_entries: int = 1000,
+    ) -> None:
+        self.enabled = enabled
+        self.key_fields = [field.strip() for field in key_fields.split(",") if field.strip()]
+        self.age_band_years = max(age_band_years, 1)
+        self.amount_bands = sorted(float(band) for band in amount_bands.split(",") if band.strip())
+        self.skeletons = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @classmethod
+    def from_env(cls) -> "PlanCache":
+        return cls(
+            enabled=os.getenv("PLAN_CACHE_ENABLED", "false").lower() == "true",
+            key_fields=os.getenv("PLAN_CACHE_KEY_FIELDS", DEFAULT_KEY_FIELDS),
+            age_band_years=int(os.getenv("PLAN_CACHE_AGE_BAND_YEARS", "10")),
+            amount_bands=os.getenv("PLAN_CACHE_AMOUNT_BANDS", DEFAULT_AMOUNT_BANDS),
+            ttl_seconds=float(os.getenv("PLAN_CACHE_TTL_SECONDS", str(24 * 3600))),
+            max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    def bucket(self, user_context: Dict[str, Any], message: str) -> Optional[Dict[str, Any]]:
+        """Describe the bucket a request falls in, or None if it can't be bucketed."""
+        amount = parse_amount(message)
+        if amount is None:
+            # Without a known total there is nothing to rescale the skeleton to
+            return None
+
+        user_context = user_context or {}
+        bucket: Dict[str, Any] = {}
+        for field in self.key_fields:
+            if field == "age":
+                age = user_context.get("age")
+                bucket["age"] = int(age) // self.age_band_years if isinstance(age, (int, float)) else None
+            elif field == "amount":
+                bucket["amount"] = sum(1 for band in self.amount_bands if amount >= band)
+            elif field == "idea":
+                bucket["idea"] = normalize_text(f"{user_context.get('user_idea', '')} {message_idea(message, amount)}")
+            else:
+                value = user_context.get(field)
+                bucket[field] = normalize_text(value) if isinstance(value, str) else value
+        return bucket
+
+    def key(self, bucket: Dict[str, Any]) -> str:
+        raw = json.dumps(bucket, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, user_context: Dict[str, Any], message: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a rescaled plan for the request, or None on a miss."""
+        if not self.enabled:
+            return None
+        bucket = self.bucket(user_context, message)
+        if bucket is None:
+            return None
+        entry = self.skeletons.get(self.key(bucket))
+        record_cache_lookup("planner", entry is not None)
+        if entry is None:
+            return None
+
+        scale = parse_amount(message) / entry["total"]
+        return [
+            {**item, "amount": round(item["amount"] * scale, 2)}
+            for item in entry["investments"]
+        ]
+
+    def store(self, user_context: Dict[str, Any], message: str, investments: List[Any]) -> None:
+        """Remember the assets, amounts and total of a planner result."""
+        if not self.enabled or not investments:
+            return
+        bucket = self.bucket(user_context, message)
+        if bucket is None:
+            return
+        skeleton = []
+        for investment in investments:
+            item = investment.model_dump() if hasattr(investment, "model_dump") else dict(investment)
+            item["explanation"] = None
+            skeleton.append(item)
+        total = sum(item["amount"] for item in skeleton)
+        if abs(total - parse_amount(message)) > 0.01:
+            # The planner didn't read the message's number as the total
+            return
+        self.skeletons.set(self.key(bucket), {"total": total, "investments": skeleton})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "key_fields": self.key_fields,
+            **self.skeletons.stats(),
+        }
+
+plan_cache = PlanCache.from_env()
@@ -0,0 +1,158 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SCORE_MIN, SCORE_MAX, SCORE_DEFAULT = 1, 10, 5
+
+def _number(value: Any) -> float:
+    """A finite float, or NaN for anything missing or unparseable."""
+    if type(value) is int:
+        return float(value)
+    if type(value) is float:
+        return value if math.isfinite(value) else math.nan
+    if value is None:
+        return math.nan
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if math.isfinite(number) else math.nan
+
+def _segment_argmax(values: np.ndarray, plan_index: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Row of the largest value of each non-empty plan (rows are grouped by plan)."""
+    order = np.lexsort((values, plan_index))
+    return order[np.cumsum(counts)[counts > 0] - 1]
+
+def normalize_portfolios(
+    plans: Sequence[Sequence[Dict[str, Any]]],
+    totals: Optional[Sequence[Optional[float]]] = None,
+) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    """Validate and repair the investments of many plans in one vectorized pass.
+
+    For each plan, items without a name are dropped. Percentages are
+    renormalized to sum to 100; they come from the amounts when any is
+    missing, or are split evenly when neither is usable. Amounts are
+    recomputed as total * percentage, with the total from `totals` or, when
+    that's None, the sum of the plan's amounts. Rounding leftovers go to the
+    largest position, so percentages add up to exactly 100 and amounts to the
+    total. Risk and ease of use are clamped to 1-10 (5 when missing).
+
+    Returns the repaired investments (copies, other fields kept) and
+    portfolio stats for every plan: the percentage weighted risk and ease of
+    use scores, the risk standard deviation, the largest position, the
+    effective number of positions (1 / Herfindahl index) and what was
+    repaired.
+    """
+    totals = list(totals) if totals is not None else [None] * len(plans)
+    rows: List[Dict[str, Any]] = []
+    plan_rows: List[int] = []
+    columns: List[Tuple[float, float, float, float]] = []
+    dropped = [0] * len(plans)
+    for plan_number, investments in enumerate(plans):
+        for investment in investments:
+            name = investment.get("name") if isinstance(investment, dict) else None
+            if not isinstance(name, str) or not name.strip():
+                dropped[plan_number] += 1
+                continue
+            rows.append(investment)
+            plan_rows.append(plan_number)
+            columns.append((
+                _number(investment.get("amount")),
+                _number(investment.get("percentage")),
+                _number(investment.get("risk")),
+                _number(investment.get("ease_of_use")),
+            ))
+
+    n_plans = len(plans)
+    plan_index = np.asarray(plan_rows, dtype=np.int64)
+    values = np.asarray(columns, dtype=np.float64).reshape(-1, 4)
+    amount, percentage, risk, ease_of_use = values.T
+    amount = np.where(amount >= 0, amount, np.nan)
+    percentage = np.where(percentage >= 0, percentage, np.nan)
+
+    def per_plan(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(plan_index, weights=weights, minlength=n_plans)
+
+    counts = np.bincount(plan_index, minlength=n_plans)
+    percentage_sum = per_plan(np.nan_to_num(percentage))
+    amount_sum = per_plan(np.nan_to_num(amount))
+    has_percentages = (per_plan(~np.isnan(percentage)) == counts) & (percentage_sum > 0)
+    has_amounts = (per_plan(~np.isnan(amount)) == counts) & (amount_sum > 0)
+
+    # Weights of each row within its plan, summing to 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(
+            has_percentages[plan_index], percentage / percentage_sum[plan_index],
+            np.where(has_amounts[plan_index], amount / amount_sum[plan_index], 1 / counts[plan_index]),
+        )
+
+    requested = np.array([_number(total) for total in totals], dtype=np.float64).reshape(-1)
+    total = np.where(requested > 0, requested, np.where(has_amounts, amount_sum, np.nan))
+    largest = _segment_argmax(weights, plan_index, counts)
+
+    new_percentage = np.round(weights * 100, 2)
+    new_percentage[largest] = np.round(new_percentage[largest] + 100 - per_plan(new_percentage)[plan_index[largest]], 2)
+    new_amount = np.round(weights * total[plan_index], 2)
+    amount_leftover = np.round(total - per_plan(np.nan_to_num(new_amount)), 2)
+    new_amount[largest] = np.round(new_amount[largest] + np.nan_to_num(amount_leftover[plan_index[largest]]), 2)
+    # Without any total the amounts are left as they were
+    new_amount = np.where(np.isnan(new_amount), np.nan_to_num(amount), new_amount)
+
+    scores = np.stack([risk, ease_of_use])
+    clamped = np.clip(np.rint(np.nan_to_num(scores, nan=SCORE_DEFAULT)), SCORE_MIN, SCORE_MAX)
+    scores_repaired = per_plan((clamped != scores).sum(axis=0).astype(np.float64))
+    new_risk, new_ease_of_use = clamped
+
+    risk_score = per_plan(weights * new_risk)
+    ease_of_use_score = per_plan(weights * new_ease_of_use)
+    risk_stddev = np.sqrt(per_plan(weights * (new_risk - risk_score[plan_index]) ** 2))
+    herfindahl = per_plan(weights ** 2)
+    max_percentage = np.zeros(n_plans)
+    max_percentage[plan_index[largest]] = new_percentage[largest]
+    amounts_repaired = per_plan((np.abs(np.nan_to_num(amount, nan=-1.0) - new_amount) > 0.01).astype(np.float64))
+    percentages_repaired = per_plan((np.abs(np.nan_to_num(percentage, nan=-1.0) - new_percentage) > 0.01).astype(np.float64))
+
+    repaired_rows = [
+        {**row, "name": row["name"].strip(), "amount": row_amount, "percentage": row_percentage,
+         "risk": int(row_risk), "ease_of_use": int(row_ease_of_use)}
+        for row, row_amount, row_percentage, row_risk, row_ease_of_use in zip(
+            rows, new_amount.tolist(), new_percentage.tolist(), new_risk.tolist(), new_ease_of_use.tolist()
+        )
+    ]
+    # Rounded and converted in bulk, indexing NumPy scalars per plan is slow
+    with np.errstate(divide="ignore"):
+        plan_columns = zip(
+            counts.tolist(),
+            np.round(total, 2).tolist(),
+            np.round(risk_score, 2).tolist(),
+            np.round(risk_stddev, 2).tolist(),
+            np.round(ease_of_use_score, 2).tolist(),
+            np.round(max_percentage, 2).tolist(),
+            np.round(1 / herfindahl, 2).tolist(),
+            dropped,
+            percentages_repaired.astype(np.int64).tolist(),
+            amounts_repaired.astype(np.int64).tolist(),
+            scores_repaired.astype(np.int64).tolist(),
+        )
+    results = []
+    start = 0
+    for count, plan_total, risk_mean, risk_spread, ease, largest_share, effective, *repairs in plan_columns:
+        investments = repaired_rows[start:start + count]
+        start += count
+        stats = {
+            "total": None if math.isnan(plan_total) else plan_total,
+            "positions": count,
+            "risk_score": risk_mean if count else None,
+            "risk_stddev": risk_spread if count else None,
+            "ease_of_use_score": ease if count else None,
+            "max_percentage": largest_share if count else None,
+            "effective_positions": effective if count else None,
+            "repairs": dict(zip(("dropped", "percentages", "amounts", "scores"), repairs)),
+        }
+        results.append((investments, stats))
+    return results
+
+def normalize_portfolio(investments: Sequence[Dict[str, Any]], total: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Validate and repair one plan's investments, see normalize_portfolios."""
+    return normalize_portfolios([investments], [total])[0]
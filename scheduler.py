@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict
+
+from telemetry import record_queue_wait
+
+class ExplainerScheduler:
+    """Bounded, fair concurrency for explainer LLM calls.
+
+    Limits in-flight calls both per plan and across the process. Waiting calls
+    are queued per plan and slots are handed out round-robin between plans, so
+    a large plan can't starve smaller plans that arrive after it.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_per_plan: int = 4) -> None:
+        if max_concurrency < 1 or max_per_plan < 1:
+            raise ValueError("Scheduler limits must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_per_plan = max_per_plan
+        self._in_flight = 0
+        self._in_flight_by_plan: Dict[str, int] = {}
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Metrics
+        self._granted = 0
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ExplainerScheduler":
+        """Build a scheduler from EXPLAINER_MAX_CONCURRENCY / EXPLAINER_MAX_PER_PLAN."""
+        return cls(
+            max_concurrency=int(os.getenv("EXPLAINER_MAX_CONCURRENCY", "16")),
+            max_per_plan=int(os.getenv("EXPLAINER_MAX_PER_PLAN", "4")),
+        )
+
+    @asynccontextmanager
+    async def slot(self, plan_key: str):
+        """Wait for a free slot for `plan_key` and hold it for the block."""
+        started = time.perf_counter()
+        await self._acquire(plan_key)
+        self._record_wait(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release(plan_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current queue depth, in-flight calls and wait time figures."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_per_plan": self.max_per_plan,
+            "in_flight": self._in_flight,
+            "queue_depth": sum(len(waiters) for waiters in self._waiters.values()),
+            "waiting_plans": len(self._waiters),
+            "granted_total": self._granted,
+            "wait_seconds_total": round(self._wait_total, 6),
+            "wait_seconds_avg": round(self._wait_total / self._wait_count, 6) if self._wait_count else 0.0,
+            "wait_seconds_max": round(self._wait_max, 6),
+        }
+
+    def _has_capacity(self, plan_key: str) -> bool:
+        return (
+            self._in_flight < self.max_concurrency
+            and self._in_flight_by_plan.get(plan_key, 0) < self.max_per_plan
+        )
+
+    def _grant(self, plan_key: str) -> None:
+        self._in_flight += 1
+        self._in_flight_by_plan[plan_key] = self._in_flight_by_plan.get(plan_key, 0) + 1
+        self._granted += 1
+
+    async def _acquire(self, plan_key: str) -> None:
+        # Only take the fast path when nobody is queued, otherwise we'd jump the line
+        if not self._waiters and self._has_capacity(plan_key):
+            self._grant(plan_key)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(plan_key, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted right as we got cancelled, hand it back
+                self._release(plan_key)
+            else:
+                self._discard(plan_key, waiter)
+            raise
+
+    def _release(self, plan_key: str) -> None:
+        self._in_flight -= 1
+        remaining = self._in_flight_by_plan.get(plan_key, 1) - 1
+        if remaining:
+            self._in_flight_by_plan[plan_key] = remaining
+        else:
+            self._in_flight_by_plan.pop(plan_key, None)
+        self._dispatch()
+
+    def _discard(self, plan_key: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiters.get(plan_key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[plan_key]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued waiters, one per plan in round-robin order."""
+        while self._in_flight < self.max_concurrency and self._waiters:
+            for plan_key in self._waiters:
+                if self._in_flight_by_plan.get(plan_key, 0) < self.max_per_plan:
+                    break
+            else:
+                # Every waiting plan is already at its own limit
+                return
+
+            waiters = self._waiters[plan_key]
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(plan_key)
+            else:
+                del self._waiters[plan_key]
+
+            if waiter.done():
+                continue
+            self._grant(plan_key)
+            waiter.set_result(None)
+
+    def _record_wait(self, seconds: float) -> None:
+        record_queue_wait("explainer", seconds)
+        self._wait_count += 1
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+explainer_scheduler = ExplainerScheduler.from_env()
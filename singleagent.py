@@ -1,15 +1,11 @@
-from agents.news_agent.agent import NewsAgentBuilder
+import asyncio
 
-news_agent = NewsAgentBuilder().build();
+from news import news_digests
 
-config = {"configurable": {"thread_id": "user_session_123"}}
+# Build one digest without storing it, e.g. to try a search backend or news model
+digest = asyncio.run(news_digests.build_digest("Argentina"))
 
-input_message = {
-    "role": "user",
-    "content": "Give me the most important financial news in Argentina",
-}
-
-for step in news_agent.stream(
-    {"messages": [input_message]}, config, stream_mode="values"
-):
-    step["messages"][-1].pretty_print()
\ No newline at end of file
+for headline in digest["headlines"]:
+    print(f"- {headline['title']} ({headline['url']})")
+print()
+print(digest["summary"])
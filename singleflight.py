@@ -0,0 +1,48 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+def request_key(payload: Any) -> str:
+    """Stable hash of a JSON-serializable request body."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it's in flight await the same task and get the same result (or
+    exception). The task is shielded, so a caller disconnecting doesn't
+    cancel the work for everyone else.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "shared": self.shared,
+        }
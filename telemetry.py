@@ -0,0 +1,222 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    """Monotonic counter with labels, exported in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    """Cumulative bucket histogram with labels, exported in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+http_request_seconds = Histogram(
+    "open_invest_http_request_seconds", "Wall time of HTTP requests", ("method", "route", "status"))
+stage_seconds = Histogram(
+    "open_invest_stage_seconds", "Wall time of workflow stages (planner, explainer, mongo_write, serialization, ...)", ("stage",))
+queue_wait_seconds = Histogram(
+    "open_invest_queue_wait_seconds", "Time spent waiting for a concurrency slot", ("queue",))
+llm_tokens = Histogram(
+    "open_invest_llm_tokens", "Tokens per LLM call", ("role", "kind"), buckets=TOKEN_BUCKETS)
+cache_lookups_total = Counter(
+    "open_invest_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+
+METRICS = [http_request_seconds, stage_seconds, queue_wait_seconds, llm_tokens, cache_lookups_total]
+
+class RequestTimings:
+    """Per-request breakdown of time spent in each stage, for the Server-Timing header."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+# Set by TimingMiddleware; graph tasks inherit it, so stages land on the request that ran them
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+def record_stage(stage: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the block as `stage`, in the histogram and the current request's breakdown."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def record_queue_wait(queue: str, seconds: float) -> None:
+    queue_wait_seconds.observe(seconds, queue=queue)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(f"{queue}_queue", seconds)
+
+def record_usage(role: str, message: Any) -> None:
+    """Record the prompt and completion tokens of an LLM response message."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        llm_tokens.observe(usage.get("input_tokens", 0), role=role, kind="prompt")
+        llm_tokens.observe(usage.get("output_tokens", 0), role=role, kind="completion")
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    cache_lookups_total.inc(cache=cache, result="hit" if hit else "miss")
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class TimingMiddleware:
+    """ASGI middleware that times requests and can add a Server-Timing header.
+
+    The header lists the stages recorded while the request ran (planner,
+    explainer, queue waits, mongo_write, serialization, total). For streamed
+    responses it only covers the work done before the first byte.
+    """
+
+    def __init__(self, app, server_timing: bool = False) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - started).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                # Route templates, not raw paths, to keep label cardinality bounded
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per log line, with any `extra` fields included."""
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging() -> None:
+    """Set up the open_invest loggers from LOG_LEVEL and LOG_FORMAT (text or json)."""
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("open_invest")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())